@@ -8,12 +8,23 @@ Provides administrative endpoints for:
 - Session management
 
 All admin endpoints require the GONKA_ADMIN_API_KEY.
+
+Read-only endpoints are cached in-process for GONKA_ADMIN_CACHE_TTL
+seconds so dashboard polling doesn't re-run the underlying queries.
+The model and session listings also carry an ETag and answer
+If-None-Match with 304 while nothing has changed.
 """
 
+import asyncio
+import hashlib
+import hmac
 import time
 import uuid
+from typing import Any, Optional
 
-from fastapi import APIRouter, Request
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel
 
 from config.settings import get_settings
 from gateway.auth import AuthManager, extract_api_key
@@ -33,6 +44,58 @@ _model_router = None
 _session_mgr = None
 _tiering = None
 _health_checker = None
+_admin_key = b""
+
+
+class _ResponseCache:
+    """Small TTL cache for admin read endpoints, grouped by namespace."""
+
+    MAX_ENTRIES = 1024
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._entries: dict[tuple, tuple[float, Any]] = {}
+
+    def get(self, namespace: str, *key) -> Optional[Any]:
+        entry = self._entries.get((namespace, *key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[(namespace, *key)]
+            return None
+        return value
+
+    def set(self, namespace: str, *key, value: Any) -> Any:
+        if self.ttl > 0:
+            now = time.time()
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+            self._entries[(namespace, *key)] = (now + self.ttl, value)
+        return value
+
+    def clear(self, namespace: str):
+        for entry_key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[entry_key]
+
+
+_cache = _ResponseCache(ttl_seconds=0)
+
+# Versions restart with the process (and differ between workers), so the
+# boot id keeps a stale ETag from ever matching a new process's state.
+_BOOT_ID = uuid.uuid4().hex
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b(repr((_BOOT_ID, *parts)).encode(), digest_size=8).hexdigest()
+    # Weak: derived idle times keep ticking without changing the tag
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> bool:
+    """Set the ETag header; True if the client already holds this version."""
+    response.headers["ETag"] = etag
+    return request.headers.get("if-none-match") == etag
 
 
 def init_admin_routes(
@@ -43,26 +106,33 @@ def init_admin_routes(
     tiering: ModelTiering,
     health_checker: HealthChecker,
 ):
-    global _auth_mgr, _usage_meter, _model_router, _session_mgr, _tiering, _health_checker
+    global _auth_mgr, _usage_meter, _model_router, _session_mgr, _tiering, _health_checker, _cache
+    global _admin_key
     _auth_mgr = auth_manager
     _usage_meter = usage_meter
     _model_router = model_router
     _session_mgr = session_manager
     _tiering = tiering
     _health_checker = health_checker
+    settings = get_settings()
+    _cache = _ResponseCache(settings.admin_cache_ttl_seconds)
+    _admin_key = settings.admin_api_key.encode()
 
 
 def _require_admin(request: Request):
     """Validate admin API key."""
-    settings = get_settings()
     api_key = extract_api_key(request)
 
-    if not settings.admin_api_key:
+    if not _admin_key:
         # No admin key configured — allow dev access
         return True
 
-    if api_key != settings.admin_api_key:
-        raise ValueError("Invalid admin API key")
+    # Constant-time comparison so response timing doesn't leak the key
+    if not hmac.compare_digest(api_key.encode(), _admin_key):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": {"message": "Invalid admin API key", "type": "invalid_request_error", "code": "invalid_api_key"}},
+        )
     return True
 
 
@@ -73,29 +143,41 @@ def _require_admin(request: Request):
 async def global_usage(request: Request, since_hours: float = 24):
     """Get global usage statistics."""
     _require_admin(request)
+    cached = _cache.get("usage", since_hours)
+    if cached is not None:
+        return cached
     since = time.time() - (since_hours * 3600)
     stats = _usage_meter.get_global_stats(since)
-    return {"period_hours": since_hours, **stats}
+    return _cache.set("usage", since_hours, value={"period_hours": since_hours, **stats})
 
 
 @router.get("/usage/key/{api_key}")
 async def key_usage(api_key: str, request: Request, since_hours: float = 24):
     """Get usage statistics for a specific API key."""
     _require_admin(request)
+    cached = _cache.get("usage", "key", api_key, since_hours)
+    if cached is not None:
+        return cached
     since = time.time() - (since_hours * 3600)
     usage = _usage_meter.get_usage_by_key(api_key, since)
     breakdown = _usage_meter.get_usage_breakdown(api_key, since)
-    return {"api_key": api_key[:8] + "...", "period_hours": since_hours,
-            "summary": usage, "by_model": breakdown}
+    return _cache.set("usage", "key", api_key, since_hours, value={
+        "api_key": api_key[:8] + "...", "period_hours": since_hours,
+        "summary": usage, "by_model": breakdown,
+    })
 
 
 @router.get("/usage/model/{model}")
 async def model_usage(model: str, request: Request, since_hours: float = 24):
     """Get usage statistics for a specific model."""
     _require_admin(request)
+    cached = _cache.get("usage", "model", model, since_hours)
+    if cached is not None:
+        return cached
     since = time.time() - (since_hours * 3600)
     usage = _usage_meter.get_usage_by_model(model, since)
-    return {"model": model, "period_hours": since_hours, **usage}
+    return _cache.set("usage", "model", model, since_hours,
+                      value={"model": model, "period_hours": since_hours, **usage})
 
 
 @router.get("/usage/session/{session_id}")
@@ -109,29 +191,37 @@ async def session_usage(session_id: str, request: Request):
 # ---------- API Key Management ----------
 
 
+class CreateKeyBody(BaseModel):
+    owner: str = "unknown"
+    tier: str = "standard"
+    rpm_limit: int = 60
+    tpm_limit: int = 100_000
+    key: Optional[str] = None
+
+
 @router.get("/keys")
 async def list_keys(request: Request):
     """List all API keys (masked)."""
     _require_admin(request)
+    cached = _cache.get("keys")
+    if cached is not None:
+        return cached
     keys = _auth_mgr.list_keys()
-    return {"keys": keys, "count": len(keys)}
+    return _cache.set("keys", value={"keys": keys, "count": len(keys)})
 
 
-@router.post("/keys")
-async def create_key(request: Request):
+# As a dependency, the admin check runs before the body is validated
+@router.post("/keys", dependencies=[Depends(_require_admin)])
+async def create_key(body: Optional[CreateKeyBody] = None):
     """Create a new API key."""
-    _require_admin(request)
-    body = await request.json()
-
-    owner = body.get("owner", "unknown")
-    tier = body.get("tier", "standard")
-    rpm_limit = body.get("rpm_limit", 60)
-    tpm_limit = body.get("tpm_limit", 100_000)
-    key = body.get("key", f"gk-{uuid.uuid4().hex}")
+    body = body or CreateKeyBody()
+    key = body.key or f"gk-{uuid.uuid4().hex}"
 
-    api_key = _auth_mgr.add_key(key, owner, tier, rpm_limit, tpm_limit)
+    api_key = _auth_mgr.add_key(key, body.owner, body.tier, body.rpm_limit, body.tpm_limit)
+    _cache.clear("keys")
     return {
-        "key": api_key.key,
+        # The only time the plaintext key is returned
+        "key": key,
         "owner": api_key.owner,
         "tier": api_key.tier,
         "rpm_limit": api_key.rpm_limit,
@@ -144,6 +234,7 @@ async def revoke_key(api_key: str, request: Request):
     """Revoke an API key."""
     _require_admin(request)
     revoked = _auth_mgr.revoke_key(api_key)
+    _cache.clear("keys")
     return {"revoked": revoked, "key": api_key[:8] + "..."}
 
 
@@ -151,23 +242,35 @@ async def revoke_key(api_key: str, request: Request):
 
 
 @router.get("/models")
-async def model_status(request: Request):
+async def model_status(request: Request, response: Response):
     """Get detailed model status including health."""
     _require_admin(request)
+    etag = _etag("models", _model_router.config_version)
+    if _not_modified(request, response, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    cached = _cache.get("models", etag)
+    if cached is not None:
+        return cached
     models = _model_router.list_models()
-    return {"models": models, "count": len(models)}
+    return _cache.set("models", etag, value={"models": models, "count": len(models)})
 
 
 @router.get("/models/health")
 async def models_health(request: Request):
     """Check health of all model backends."""
     _require_admin(request)
-    status = await _health_checker.get_status()
-    queue = await _health_checker.get_queue_depth()
-    return {
-        "backend": status.to_dict(),
-        "queue": queue,
-    }
+    body = _cache.get("models", "health")
+    if body is None:
+        status, queue = await asyncio.gather(
+            _health_checker.get_status(),
+            _health_checker.get_queue_depth(),
+        )
+        # Cache the encoded body; hits skip both the probes and the encoding
+        body = _cache.set("models", "health", value=orjson.dumps({
+            "backend": status.to_dict(),
+            "queue": queue,
+        }))
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/models/reload")
@@ -176,6 +279,8 @@ async def reload_models(request: Request):
     _require_admin(request)
     _model_router.reload()
     _tiering.reload()
+    _cache.clear("models")
+    _cache.clear("tiering")
     return {"reloaded": True, "model_count": _model_router.model_count}
 
 
@@ -183,11 +288,19 @@ async def reload_models(request: Request):
 
 
 @router.get("/sessions")
-async def list_all_sessions(request: Request):
+async def list_all_sessions(request: Request, response: Response):
     """List all active sessions (admin view)."""
     _require_admin(request)
+    etag = _etag("sessions", _session_mgr.version)
+    if _not_modified(request, response, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    cached = _cache.get("sessions", etag)
+    if cached is not None:
+        return cached
     sessions = _session_mgr.list_sessions()
-    return {"sessions": sessions, "active_count": _session_mgr.active_count}
+    return _cache.set("sessions", etag, value={
+        "sessions": sessions, "active_count": _session_mgr.active_count,
+    })
 
 
 @router.post("/sessions/cleanup")
@@ -195,6 +308,7 @@ async def force_cleanup(request: Request):
     """Force cleanup of expired sessions."""
     _require_admin(request)
     removed = _session_mgr.cleanup_expired()
+    _cache.clear("sessions")
     return {"removed": removed, "remaining": _session_mgr.active_count}
 
 
@@ -205,4 +319,7 @@ async def force_cleanup(request: Request):
 async def tiering_config(request: Request):
     """Get current model tiering configuration."""
     _require_admin(request)
-    return _tiering.config
+    cached = _cache.get("tiering")
+    if cached is not None:
+        return cached
+    return _cache.set("tiering", value=_tiering.config)
@@ -0,0 +1,72 @@
+"""
+Local text embeddings for Gonka.ai agent memory.
+
+Runs a small sentence-embedding model (ONNX, via fastembed) in-process
+so the sqlite-vec memory backend never calls out to a remote service.
+Recently embedded texts are kept in an LRU cache, since agents tend to
+re-send the same queries and re-write the same values.
+
+fastembed is optional: it is only imported when the sqlite-vec memory
+backend is selected (GONKA_MEMORY_BACKEND=sqlite-vec).
+"""
+
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+
+class Embedder:
+    """Sentence embeddings from a local ONNX model, with an LRU cache."""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL,
+                 cache_dir: Optional[str] = None, cache_size: int = 4096):
+        try:
+            from fastembed import TextEmbedding
+        except ImportError as e:
+            raise RuntimeError(
+                "The sqlite-vec memory backend needs fastembed: pip install fastembed"
+            ) from e
+
+        self.model_name = model_name
+        self._model = TextEmbedding(model_name=model_name, cache_dir=cache_dir)
+        self._cache: OrderedDict[str, list[float]] = OrderedDict()
+        self._cache_size = cache_size
+        self.dim = len(self.embed("dimension probe"))
+
+    def embed(self, text: str) -> list[float]:
+        """Embed one text, reusing the cached vector if we've seen it."""
+        vector = self._cache.get(text)
+        if vector is not None:
+            self._cache.move_to_end(text)
+            return vector
+
+        vector = next(iter(self._model.embed([text]))).tolist()
+        self._remember(text, vector)
+        return vector
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed many texts; cache misses go through the model in one batch."""
+        vectors: dict[str, list[float]] = {}
+        misses = []
+        for text in texts:
+            if text in vectors:
+                continue
+            vector = self._cache.get(text)
+            if vector is None:
+                misses.append(text)
+                vectors[text] = None
+            else:
+                self._cache.move_to_end(text)
+                vectors[text] = vector
+
+        if misses:
+            for text, vector in zip(misses, self._model.embed(misses)):
+                vectors[text] = vector.tolist()
+                self._remember(text, vectors[text])
+        return [vectors[text] for text in texts]
+
+    def _remember(self, text: str, vector: list[float]):
+        self._cache[text] = vector
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
@@ -3,22 +3,70 @@ Memory API for Gonka.ai agent inference.
 
 Provides long-term context storage for agents:
 - Key-value storage with namespaces
-- Basic semantic search using TF-IDF similarity
+- Full-text search ranked by BM25 (SQLite FTS5), with a TF-IDF
+  fallback for SQLite builds compiled without FTS5
+- Optional semantic search: with GONKA_MEMORY_BACKEND=sqlite-vec, each
+  row also gets a local embedding stored in a sqlite-vec table in the
+  same database, and search() does nearest-neighbour lookup in SQLite
 - Scoped per API key (agents can only access their own memory)
 
 Stored in SQLite for persistence.
 """
 
+import heapq
 import math
+from array import array
 import re
 import sqlite3
+import threading
 import time
-from collections import Counter
+from collections import Counter, defaultdict
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
+from agent.embeddings import Embedder
+
+# Alphanumeric runs of 2+ characters; very short tokens carry no signal
+_TOKEN_RE = re.compile(r"\b[a-z0-9]{2,}\b")
+
+_UPSERT_SQL = """
+    INSERT INTO memory (api_key, namespace, key, value, metadata, tokens, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (api_key, namespace, key)
+    DO UPDATE SET value = excluded.value, metadata = excluded.metadata,
+                  tokens = excluded.tokens, updated_at = excluded.updated_at
+"""
+
+# BM25 parameters; the same defaults as FTS5's bm25()
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+# Per-term matches in one namespace, with each document's term frequency
+# (highlight() marks every matched token) and length in characters. Only
+# length relative to the namespace mean matters, so characters stand in
+# for tokens.
+_FTS_TERM_SQL = """
+    SELECT id, length, length(marked) - length(replace(marked, char(1), '')) AS tf
+    FROM (
+        SELECT m.rowid AS id, length(m.value) AS length,
+               highlight(memory_fts, 0, char(1), '') AS marked
+        FROM memory_fts JOIN memory m ON m.rowid = memory_fts.rowid
+        WHERE memory_fts MATCH ? AND m.api_key = ? AND m.namespace = ?
+    )
+"""
+
+# Rows per embedding-model call when backfilling the vector index
+_EMBED_BATCH_SIZE = 256
+
+_VEC_REPLACE_SQL = [
+    # vec0 tables don't support upserts, so replace the row outright
+    "DELETE FROM memory_vec WHERE rowid = ?",
+    """INSERT INTO memory_vec (rowid, api_key, namespace, embedding, updated_at)
+       VALUES (?, ?, ?, vec_int8(?), ?)""",
+]
+
 
 @dataclass
 class MemoryEntry:
@@ -30,16 +78,32 @@ class MemoryEntry:
     updated_at: float = 0.0
 
 
+@dataclass
+class _TfidfIndex:
+    """Per-namespace TF-IDF postings used by the non-FTS5 search path."""
+    rows: list[sqlite3.Row]
+    idf: dict[str, float]
+    postings: dict[str, list[tuple[int, float]]]  # term -> [(doc, tf * idf)]
+    norms: list[float]
+
+
 class MemoryStore:
     """Key-value memory with basic semantic search for agent long-term context."""
 
-    def __init__(self, db_path: str = "data/memory.db"):
+    def __init__(self, db_path: str = "data/memory.db",
+                 embedder: Optional[Embedder] = None):
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._db_path = db_path
+        self._embedder = embedder
+        self._tls = threading.local()
+        self._tfidf_cache: dict[tuple[str, str], _TfidfIndex] = {}
+        self._fts_stats_cache: dict[tuple[str, str], Optional[tuple[int, float]]] = {}
         self._init_db()
 
     def _init_db(self):
-        with self._conn() as conn:
+        # WAL is persistent in the database file, so set it once here
+        self._connection().execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS memory (
                     api_key TEXT NOT NULL,
@@ -47,110 +111,428 @@ class MemoryStore:
                     key TEXT NOT NULL,
                     value TEXT NOT NULL,
                     metadata TEXT DEFAULT '{}',
+                    tokens TEXT,
                     created_at REAL NOT NULL,
                     updated_at REAL NOT NULL,
                     PRIMARY KEY (api_key, namespace, key)
                 )
             """)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(memory)")}
+            if "tokens" not in columns:
+                conn.execute("ALTER TABLE memory ADD COLUMN tokens TEXT")
+
+            # The primary key index (api_key, namespace, key) already covers
+            # list_keys/list_namespaces/clear_namespace; a separate
+            # (api_key, namespace) index only adds write amplification.
+            conn.execute("DROP INDEX IF EXISTS idx_memory_ns")
+
+        self._fts = self._init_fts()
+        self._vec = self._init_vec()
+
+    def _init_fts(self) -> bool:
+        """Set up the FTS5 index. Returns False if SQLite lacks FTS5."""
+        try:
+            with self._transaction() as conn:
+                # External-content FTS5 index over memory.value, kept in sync
+                # by triggers. The upsert in put() fires the UPDATE trigger.
+                fts_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_fts'"
+                ).fetchone()
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+                        value,
+                        content='memory',
+                        content_rowid='rowid',
+                        tokenize='porter unicode61'
+                    )
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS memory_fts_ai AFTER INSERT ON memory BEGIN
+                        INSERT INTO memory_fts (rowid, value) VALUES (new.rowid, new.value);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS memory_fts_ad AFTER DELETE ON memory BEGIN
+                        INSERT INTO memory_fts (memory_fts, rowid, value)
+                        VALUES ('delete', old.rowid, old.value);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS memory_fts_au AFTER UPDATE OF value ON memory BEGIN
+                        INSERT INTO memory_fts (memory_fts, rowid, value)
+                        VALUES ('delete', old.rowid, old.value);
+                        INSERT INTO memory_fts (rowid, value) VALUES (new.rowid, new.value);
+                    END
+                """)
+                if not fts_exists:
+                    # Index rows written before the FTS table existed
+                    conn.execute("INSERT INTO memory_fts (memory_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            if "fts5" not in str(e):
+                raise
+            # SQLite built without FTS5: search() falls back to TF-IDF over
+            # the token cache stored with each row
+            return False
+        return True
+
+    def _init_vec(self) -> bool:
+        """Set up the sqlite-vec embedding table when an embedder is configured."""
+        if self._embedder is None:
+            # The delete trigger needs the vec0 module, which isn't loaded
+            # without an embedder; _sync_vec() catches up if it comes back.
+            with self._transaction() as conn:
+                conn.execute("DROP TRIGGER IF EXISTS memory_vec_ad")
+            return False
+
+        column = f"INT8[{self._embedder.dim}]"
+        with self._transaction() as conn:
+            existing = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'memory_vec'"
+            ).fetchone()
+            legacy = []
+            if existing and column not in existing["sql"]:
+                if f"FLOAT[{self._embedder.dim}]" in existing["sql"]:
+                    # float32 table from before quantization: keep the vectors
+                    legacy = conn.execute(
+                        "SELECT rowid, api_key, namespace, embedding, updated_at FROM memory_vec"
+                    ).fetchall()
+                # Otherwise the model (and so the dimension) changed, and
+                # _sync_vec() re-embeds everything
+                conn.execute("DROP TABLE memory_vec")
+
+            # api_key partitions the index so a search only scans the
+            # caller's own vectors; updated_at detects stale embeddings
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS memory_vec USING vec0(
+                    api_key TEXT PARTITION KEY,
+                    namespace TEXT,
+                    embedding {column} DISTANCE_METRIC=cosine,
+                    +updated_at FLOAT
+                )
+            """)
+            for r in legacy:
+                conn.execute(_VEC_REPLACE_SQL[1], (
+                    r["rowid"], r["api_key"], r["namespace"],
+                    _quantize(array("f", r["embedding"])), r["updated_at"],
+                ))
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_memory_ns
-                ON memory (api_key, namespace)
+                CREATE TRIGGER IF NOT EXISTS memory_vec_ad AFTER DELETE ON memory BEGIN
+                    DELETE FROM memory_vec WHERE rowid = old.rowid;
+                END
             """)
+        self._sync_vec()
+        return True
+
+    def _sync_vec(self):
+        """Embed rows written while the vector index was off or out of date."""
+        conn = self._connection()
+        conn.execute("DELETE FROM memory_vec WHERE rowid NOT IN (SELECT rowid FROM memory)")
+        stale = conn.execute(
+            """SELECT m.rowid, m.api_key, m.namespace, m.value, m.updated_at
+               FROM memory m LEFT JOIN memory_vec v ON v.rowid = m.rowid
+               WHERE v.rowid IS NULL OR v.updated_at != m.updated_at"""
+        ).fetchall()
+        # Backfill in batches: one model call and one commit per batch
+        for start in range(0, len(stale), _EMBED_BATCH_SIZE):
+            batch = stale[start:start + _EMBED_BATCH_SIZE]
+            embeddings = self._embed_many([row["value"] for row in batch])
+            with self._transaction() as conn:
+                for row, embedding in zip(batch, embeddings):
+                    self._write_vec(conn, row["rowid"], row["api_key"], row["namespace"],
+                                    embedding, row["updated_at"])
+
+    def _embed(self, value: str) -> bytes:
+        return _quantize(self._embedder.embed(value))
+
+    def _embed_many(self, values: list[str]) -> list[bytes]:
+        return [_quantize(vector) for vector in self._embedder.embed_batch(values)]
+
+    @staticmethod
+    def _write_vec(conn: sqlite3.Connection, rowid: int, api_key: str,
+                   namespace: str, embedding: bytes, updated_at: float):
+        conn.execute(_VEC_REPLACE_SQL[0], (rowid,))
+        conn.execute(_VEC_REPLACE_SQL[1], (rowid, api_key, namespace, embedding, updated_at))
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._db_path, check_same_thread=False, isolation_level=None,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            if self._embedder is not None:
+                _load_sqlite_vec(conn)
+            self._tls.conn = conn
+        return conn
 
     @contextmanager
-    def _conn(self):
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
+    def _transaction(self):
+        """Run the enclosed statements in a single write transaction."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
         try:
             yield conn
-            conn.commit()
-        finally:
-            conn.close()
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
     def put(self, api_key: str, key: str, value: str,
             namespace: str = "default", metadata: str = "{}"):
         """Store or update a memory entry."""
         now = time.time()
-        with self._conn() as conn:
-            conn.execute(
-                """INSERT INTO memory (api_key, namespace, key, value, metadata, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)
-                   ON CONFLICT (api_key, namespace, key)
-                   DO UPDATE SET value = ?, metadata = ?, updated_at = ?""",
-                (api_key, namespace, key, value, metadata, now, now,
-                 value, metadata, now),
-            )
+        row = (api_key, namespace, key, value, metadata, self._tokens(value), now, now)
+        if self._vec:
+            # Embed before taking the write lock; the row and its vector
+            # commit together
+            embedding = self._embed(value)
+            with self._transaction() as conn:
+                rowid = conn.execute(_UPSERT_SQL + " RETURNING rowid", row).fetchone()[0]
+                self._write_vec(conn, rowid, api_key, namespace, embedding, now)
+        else:
+            # A single statement in autocommit mode is its own transaction
+            self._connection().execute(_UPSERT_SQL, row)
+        self._invalidate(api_key, namespace)
+
+    def put_many(self, api_key: str,
+                 items: list[tuple[str, str, str, str]]) -> int:
+        """
+        Store or update many entries in one transaction.
+
+        Each item is a (key, value, namespace, metadata) tuple.
+        Returns the number of entries written.
+        """
+        now = time.time()
+        rows = [
+            (api_key, namespace, key, value, metadata, self._tokens(value), now, now)
+            for key, value, namespace, metadata in items
+        ]
+        if self._vec:
+            embeddings = self._embed_many([item[1] for item in items])
+            with self._transaction() as conn:
+                for row, embedding in zip(rows, embeddings):
+                    rowid = conn.execute(_UPSERT_SQL + " RETURNING rowid", row).fetchone()[0]
+                    self._write_vec(conn, rowid, api_key, row[1], embedding, now)
+        else:
+            with self._transaction() as conn:
+                conn.executemany(_UPSERT_SQL, rows)
+        for namespace in {item[2] for item in items}:
+            self._invalidate(api_key, namespace)
+        return len(rows)
+
+    def _tokens(self, value: str) -> Optional[str]:
+        """Token cache for the TF-IDF fallback; FTS5 keeps its own index."""
+        if self._fts:
+            return None
+        return " ".join(_tokenize(value))
 
     def get(self, api_key: str, key: str,
             namespace: str = "default") -> Optional[MemoryEntry]:
         """Get a memory entry by key."""
-        with self._conn() as conn:
-            row = conn.execute(
-                """SELECT key, value, namespace, metadata, created_at, updated_at
-                   FROM memory WHERE api_key = ? AND namespace = ? AND key = ?""",
-                (api_key, namespace, key),
-            ).fetchone()
-            if row:
-                return MemoryEntry(**dict(row))
-            return None
+        row = self._connection().execute(
+            """SELECT key, value, namespace, metadata, created_at, updated_at
+               FROM memory WHERE api_key = ? AND namespace = ? AND key = ?""",
+            (api_key, namespace, key),
+        ).fetchone()
+        if row:
+            return MemoryEntry(**dict(row))
+        return None
 
     def delete(self, api_key: str, key: str, namespace: str = "default") -> bool:
         """Delete a memory entry."""
-        with self._conn() as conn:
-            cursor = conn.execute(
-                "DELETE FROM memory WHERE api_key = ? AND namespace = ? AND key = ?",
-                (api_key, namespace, key),
-            )
-            return cursor.rowcount > 0
+        cursor = self._connection().execute(
+            "DELETE FROM memory WHERE api_key = ? AND namespace = ? AND key = ?",
+            (api_key, namespace, key),
+        )
+        self._invalidate(api_key, namespace)
+        return cursor.rowcount > 0
 
     def list_keys(self, api_key: str, namespace: str = "default") -> list[str]:
         """List all keys in a namespace."""
-        with self._conn() as conn:
-            rows = conn.execute(
-                "SELECT key FROM memory WHERE api_key = ? AND namespace = ?",
-                (api_key, namespace),
-            ).fetchall()
-            return [r["key"] for r in rows]
+        rows = self._connection().execute(
+            "SELECT key FROM memory WHERE api_key = ? AND namespace = ?",
+            (api_key, namespace),
+        ).fetchall()
+        return [r["key"] for r in rows]
 
     def list_namespaces(self, api_key: str) -> list[str]:
         """List all namespaces for an API key."""
-        with self._conn() as conn:
-            rows = conn.execute(
-                "SELECT DISTINCT namespace FROM memory WHERE api_key = ?",
-                (api_key,),
-            ).fetchall()
-            return [r["namespace"] for r in rows]
+        rows = self._connection().execute(
+            "SELECT DISTINCT namespace FROM memory WHERE api_key = ?",
+            (api_key,),
+        ).fetchall()
+        return [r["namespace"] for r in rows]
 
     def search(self, api_key: str, query: str,
                namespace: str = "default", limit: int = 10) -> list[dict]:
         """
-        Basic semantic search using TF-IDF cosine similarity.
+        Search memory values: nearest neighbours by embedding when the
+        sqlite-vec backend is enabled, otherwise full-text ranked by BM25.
 
-        For production, swap this with a vector store (FAISS, Qdrant, etc.).
-        This implementation works for small-to-medium memory stores.
+        Full-text query terms are OR-ed together so partial matches still rank.
+        Every backend reports "similarity" in [0, 1], higher is better; for
+        BM25 it is score / (1 + score), with term statistics taken from the
+        caller's namespace only.
         """
-        with self._conn() as conn:
-            rows = conn.execute(
-                """SELECT key, value, namespace, metadata, created_at, updated_at
-                   FROM memory WHERE api_key = ? AND namespace = ?""",
+        query_tokens = _tokenize(query)
+        if not query_tokens:
+            return []
+
+        if self._vec:
+            return self._search_vec(api_key, query, namespace, limit)
+
+        if not self._fts:
+            return self._search_tfidf(api_key, query_tokens, namespace, limit)
+
+        stats = self._fts_stats(api_key, namespace)
+        if stats is None:
+            return []
+        doc_count, avg_length = stats
+
+        # BM25 over this namespace only: FTS5's own bm25() weighs terms by
+        # document frequencies across the whole table, i.e. every tenant's
+        # rows. FTS5 still does the matching (and stemming); highlight()
+        # marks each matched token, which gives the term frequency.
+        conn = self._connection()
+        scores: dict[int, float] = defaultdict(float)
+        for term in dict.fromkeys(query_tokens):
+            # Tokens are [a-z0-9] only, so quoting is enough to escape FTS syntax
+            matches = conn.execute(_FTS_TERM_SQL, (f'"{term}"', api_key, namespace)).fetchall()
+            if not matches:
+                continue
+            # Lucene's idf form, which stays positive when a term is in
+            # most (or all) of a namespace's documents
+            df = len(matches)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc, length, tf in matches:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * length / avg_length)
+                scores[doc] += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        if not top:
+            return []
+        rows = {
+            r["rowid"]: r
+            for r in conn.execute(
+                f"""SELECT rowid, key, value, namespace, metadata FROM memory
+                    WHERE rowid IN ({", ".join("?" * len(top))})""",
+                [doc for doc, _ in top],
+            )
+        }
+
+        # Map the unbounded BM25 score onto (0, 1) like the other backends;
+        # a match never reports 0
+        return [
+            {
+                "key": rows[doc]["key"],
+                "value": rows[doc]["value"],
+                "namespace": rows[doc]["namespace"],
+                "similarity": max(round(score / (1 + score), 4), 0.0001),
+                "metadata": rows[doc]["metadata"],
+            }
+            for doc, score in top
+            if doc in rows
+        ]
+
+    def _fts_stats(self, api_key: str, namespace: str) -> Optional[tuple[int, float]]:
+        """Document count and mean value length for a namespace, cached like the TF-IDF index."""
+        self._check_data_version()
+        cache_key = (api_key, namespace)
+        if cache_key not in self._fts_stats_cache:
+            doc_count, avg_length = self._connection().execute(
+                "SELECT COUNT(*), AVG(length(value)) FROM memory WHERE api_key = ? AND namespace = ?",
                 (api_key, namespace),
-            ).fetchall()
+            ).fetchone()
+            self._fts_stats_cache[cache_key] = (doc_count, avg_length or 1.0) if doc_count else None
+        return self._fts_stats_cache[cache_key]
+
+    def _search_vec(self, api_key: str, query: str,
+                    namespace: str, limit: int) -> list[dict]:
+        """k-nearest-neighbour search over the sqlite-vec embedding table."""
+        rows = self._connection().execute(
+            """WITH knn AS (
+                   SELECT rowid, distance FROM memory_vec
+                   WHERE embedding MATCH vec_int8(?) AND k = ? AND api_key = ? AND namespace = ?
+               )
+               SELECT m.key, m.value, m.namespace, m.metadata, knn.distance
+               FROM knn JOIN memory m ON m.rowid = knn.rowid
+               ORDER BY knn.distance""",
+            (self._embed(query), limit, api_key, namespace),
+        ).fetchall()
+
+        # Cosine distance is in [0, 2]; map it onto a [0, 1] similarity
+        return [
+            {
+                "key": r["key"],
+                "value": r["value"],
+                "namespace": r["namespace"],
+                "similarity": round(max(0.0, 1.0 - r["distance"] / 2.0), 4),
+                "metadata": r["metadata"],
+            }
+            for r in rows
+        ]
 
-        if not rows:
+    def _search_tfidf(self, api_key: str, query_tokens: list[str],
+                      namespace: str, limit: int) -> list[dict]:
+        """TF-IDF cosine similarity for SQLite builds without FTS5."""
+        index = self._tfidf_index(api_key, namespace)
+        if not index.rows:
             return []
 
-        # Tokenize
-        query_tokens = _tokenize(query)
-        if not query_tokens:
+        query_tf = Counter(query_tokens)
+        query_vec = {t: tf * index.idf.get(t, 1.0) for t, tf in query_tf.items()}
+        query_norm = math.sqrt(sum(v ** 2 for v in query_vec.values()))
+        if query_norm == 0:
             return []
 
-        # Calculate TF-IDF scores
-        documents = [(dict(r), _tokenize(r["value"])) for r in rows]
+        # Sparse dot product: only documents in a query term's postings score
+        dots: dict[int, float] = defaultdict(float)
+        for term, weight in query_vec.items():
+            for doc, doc_weight in index.postings.get(term, ()):
+                dots[doc] += weight * doc_weight
+
+        top = heapq.nlargest(
+            limit, dots.items(),
+            key=lambda item: item[1] / index.norms[item[0]],
+        )
+        return [
+            {
+                "key": index.rows[doc]["key"],
+                "value": index.rows[doc]["value"],
+                "namespace": index.rows[doc]["namespace"],
+                "similarity": round(dot / (query_norm * index.norms[doc]), 4),
+                "metadata": index.rows[doc]["metadata"],
+            }
+            for doc, dot in top
+        ]
+
+    def _tfidf_index(self, api_key: str, namespace: str) -> "_TfidfIndex":
+        """Return the cached TF-IDF index for a namespace, building it if needed."""
+        self._check_data_version()
+        cache_key = (api_key, namespace)
+        index = self._tfidf_cache.get(cache_key)
+        if index is not None:
+            return index
+
+        rows = self._connection().execute(
+            """SELECT key, value, namespace, metadata, tokens
+               FROM memory WHERE api_key = ? AND namespace = ?""",
+            (api_key, namespace),
+        ).fetchall()
+
+        # Rows written while FTS5 was available have no cached tokens
+        documents = [
+            r["tokens"].split() if r["tokens"] is not None else _tokenize(r["value"])
+            for r in rows
+        ]
 
-        # IDF
         doc_count = len(documents)
         df = Counter()
-        for _, tokens in documents:
+        for tokens in documents:
             df.update(set(tokens))
 
         idf = {
@@ -158,51 +540,73 @@ class MemoryStore:
             for term, count in df.items()
         }
 
-        # Score each document
-        query_tf = Counter(query_tokens)
-        query_vec = {t: tf * idf.get(t, 1.0) for t, tf in query_tf.items()}
-        query_norm = math.sqrt(sum(v ** 2 for v in query_vec.values()))
+        postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        norms = []
+        for doc, tokens in enumerate(documents):
+            sum_sq = 0.0
+            for term, tf in Counter(tokens).items():
+                weight = tf * idf[term]
+                postings[term].append((doc, weight))
+                sum_sq += weight ** 2
+            norms.append(math.sqrt(sum_sq))
 
-        scored = []
-        for row_dict, tokens in documents:
-            doc_tf = Counter(tokens)
-            doc_vec = {t: tf * idf.get(t, 1.0) for t, tf in doc_tf.items()}
-            doc_norm = math.sqrt(sum(v ** 2 for v in doc_vec.values()))
+        index = _TfidfIndex(rows=rows, idf=idf, postings=dict(postings), norms=norms)
+        self._tfidf_cache[cache_key] = index
+        return index
 
-            if query_norm == 0 or doc_norm == 0:
-                continue
+    def _check_data_version(self):
+        # data_version moves when another connection (e.g. another worker
+        # process) commits; writes through this store invalidate explicitly.
+        # Its value is per connection, so each thread compares against the
+        # last one its own connection reported; a thread's first look clears.
+        data_version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        if data_version != getattr(self._tls, "data_version", None):
+            self._tfidf_cache.clear()
+            self._fts_stats_cache.clear()
+            self._tls.data_version = data_version
 
-            dot_product = sum(
-                query_vec.get(t, 0) * doc_vec.get(t, 0)
-                for t in set(list(query_vec.keys()) + list(doc_vec.keys()))
-            )
-            similarity = dot_product / (query_norm * doc_norm)
-
-            if similarity > 0:
-                scored.append({
-                    "key": row_dict["key"],
-                    "value": row_dict["value"],
-                    "namespace": row_dict["namespace"],
-                    "similarity": round(similarity, 4),
-                    "metadata": row_dict["metadata"],
-                })
-
-        scored.sort(key=lambda x: x["similarity"], reverse=True)
-        return scored[:limit]
+    def _invalidate(self, api_key: str, namespace: str):
+        self._tfidf_cache.pop((api_key, namespace), None)
+        self._fts_stats_cache.pop((api_key, namespace), None)
 
     def clear_namespace(self, api_key: str, namespace: str = "default") -> int:
         """Delete all entries in a namespace."""
-        with self._conn() as conn:
-            cursor = conn.execute(
-                "DELETE FROM memory WHERE api_key = ? AND namespace = ?",
-                (api_key, namespace),
-            )
-            return cursor.rowcount
+        cursor = self._connection().execute(
+            "DELETE FROM memory WHERE api_key = ? AND namespace = ?",
+            (api_key, namespace),
+        )
+        self._invalidate(api_key, namespace)
+        return cursor.rowcount
+
+
+def _quantize(vector) -> bytes:
+    """
+    Symmetric int8 quantization: scale by the largest component to +/-127.
+
+    Cosine distance ignores vector length, so the per-vector scale never
+    needs to be stored to compare quantized vectors.
+    """
+    peak = max((abs(x) for x in vector), default=0.0) or 1.0
+    scale = 127.0 / peak
+    return array("b", [round(x * scale) for x in vector]).tobytes()
+
+
+def _load_sqlite_vec(conn: sqlite3.Connection):
+    try:
+        import sqlite_vec
+    except ImportError as e:
+        raise RuntimeError(
+            "The sqlite-vec memory backend needs sqlite-vec: pip install sqlite-vec"
+        ) from e
+    if not hasattr(conn, "enable_load_extension"):
+        raise RuntimeError("This Python's sqlite3 module can't load extensions (needed by sqlite-vec)")
+    conn.enable_load_extension(True)
+    try:
+        sqlite_vec.load(conn)
+    finally:
+        conn.enable_load_extension(False)
 
 
 def _tokenize(text: str) -> list[str]:
     """Simple whitespace + punctuation tokenizer."""
-    text = text.lower()
-    tokens = re.findall(r'\b[a-z0-9]+\b', text)
-    # Remove very short tokens
-    return [t for t in tokens if len(t) > 1]
+    return _TOKEN_RE.findall(text.lower())
@@ -9,20 +9,30 @@ Adds agent-specific endpoints on top of the OpenAI-compatible API:
 These endpoints are accessed via the same API key auth as chat completions.
 """
 
+import json
 import uuid
 import time
-from typing import Optional
+from typing import Optional, Union
 
-from fastapi import APIRouter, Request
+import httpx
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from gateway.auth import AuthManager, extract_api_key
 from gateway.errors import openai_error
-from agent.sessions import SessionManager
+from agent.sessions import Session, SessionManager
 from agent.memory import MemoryStore
 from agent.webhooks import WebhookManager
 
 router = APIRouter(prefix="/v1", tags=["agent"])
 
+# Sessions with more messages than this are streamed in chunks instead of
+# being encoded into one contiguous body
+STREAM_MESSAGES_THRESHOLD = 64
+_STREAM_CHUNK_MESSAGES = 16
+
 
 # These are set by the gateway main.py at startup
 _session_mgr: Optional[SessionManager] = None
@@ -45,40 +55,78 @@ def init_agent_routes(
     _auth_mgr = auth_manager
 
 
-def _validate_key(request: Request):
+def _authenticate(request: Request) -> str:
+    """Route dependency: the caller's API key, checked before the body is parsed."""
     api_key_str = extract_api_key(request)
-    api_key = _auth_mgr.validate(api_key_str)
-    if not api_key:
-        raise ValueError("Invalid API key")
-    return api_key_str, api_key
+    if not _auth_mgr.validate(api_key_str):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": {"message": "Invalid API key", "type": "invalid_request_error", "code": "invalid_api_key"}},
+        )
+    return api_key_str
+
+
+# ---------- Request Bodies ----------
+
+
+class CreateSessionBody(BaseModel):
+    session_id: Optional[str] = None
+    system_message: Optional[str] = None
+    metadata: dict = Field(default_factory=dict)
+
+
+class MemoryEntryBody(BaseModel):
+    key: str = ""
+    value: str = ""
+    namespace: Optional[str] = None
+    metadata: Union[dict, str] = "{}"
+
+
+class PutMemoryBody(BaseModel):
+    key: str = ""
+    value: str = ""
+    namespace: str = "default"
+    metadata: Union[dict, str] = "{}"
+    entries: Optional[list[MemoryEntryBody]] = None
+
+
+class SearchMemoryBody(BaseModel):
+    query: str = ""
+    namespace: str = "default"
+    limit: int = Field(10, ge=1, le=100)
+
+
+class RegisterWebhookBody(BaseModel):
+    url: str = ""
+    webhook_id: Optional[str] = None
+    session_id: Optional[str] = None
+    max_retries: int = 3
 
 
 # ---------- Sessions ----------
 
 
 @router.get("/sessions")
-async def list_sessions(request: Request):
+async def list_sessions(api_key_str: str = Depends(_authenticate)):
     """List active sessions for the authenticated API key."""
-    api_key_str, _ = _validate_key(request)
     sessions = _session_mgr.list_sessions(api_key=api_key_str)
     return {"sessions": sessions, "count": len(sessions)}
 
 
 @router.post("/sessions")
-async def create_session(request: Request):
+async def create_session(api_key_str: str = Depends(_authenticate), body: Optional[CreateSessionBody] = None):
     """Create a new session with optional metadata."""
-    api_key_str, _ = _validate_key(request)
-    body = await request.json() if await request.body() else {}
+    body = body or CreateSessionBody()
 
-    session_id = body.get("session_id", f"sess-{uuid.uuid4().hex[:16]}")
+    session_id = body.session_id or f"sess-{uuid.uuid4().hex[:16]}"
     session = _session_mgr.get_or_create(session_id, api_key_str)
 
-    if body.get("metadata"):
-        session.metadata.update(body["metadata"])
+    if body.metadata:
+        session.metadata.update(body.metadata)
 
-    if body.get("system_message"):
+    if body.system_message:
         _session_mgr.append_messages(session_id, [
-            {"role": "system", "content": body["system_message"]}
+            {"role": "system", "content": body.system_message}
         ])
 
     return {
@@ -89,27 +137,53 @@ async def create_session(request: Request):
 
 
 @router.get("/sessions/{session_id}")
-async def get_session(session_id: str, request: Request):
+async def get_session(session_id: str, api_key_str: str = Depends(_authenticate)):
     """Get session details and history."""
-    api_key_str, _ = _validate_key(request)
     session = _session_mgr.get(session_id)
     if not session:
         return openai_error(404, f"Session '{session_id}' not found", "invalid_request_error", "not_found")
 
-    return {
+    stream = not session.messages_json_cached and session.message_count > STREAM_MESSAGES_THRESHOLD
+    # The history only changes on the event loop, so a snapshot taken here
+    # agrees with the envelope's message_count
+    messages = session.messages if stream else None
+    version = session.messages_version
+
+    # Splice the cached messages encoding into the small, per-call envelope
+    envelope = orjson.dumps({
         "session_id": session.session_id,
         "message_count": session.message_count,
-        "messages": session.messages,
         "created_at": session.created_at,
         "last_accessed": session.last_accessed,
         "metadata": session.metadata,
-    }
-
-
-@router.delete("/sessions/{session_id}")
-async def delete_session(session_id: str, request: Request):
+    })
+    head = envelope[:-1] + b',"messages":'
+    if stream:
+        return StreamingResponse(
+            _iter_session_json(head, session, messages, version), media_type="application/json"
+        )
+    return Response(content=head + session.messages_json() + b"}", media_type="application/json")
+
+
+def _iter_session_json(head: bytes, session: Session, messages: list[dict], version: int):
+    # Sync generator: Starlette drains it in a worker thread, so encoding a
+    # long history doesn't hold up the event loop
+    parts = [b"["]
+    yield head + b"["
+    for start in range(0, len(messages), _STREAM_CHUNK_MESSAGES):
+        chunk = messages[start:start + _STREAM_CHUNK_MESSAGES]
+        prefix = b"," if start else b""
+        parts.append(prefix + b",".join(orjson.dumps(m) for m in chunk))
+        yield parts[-1]
+    yield b"]}"
+    # Later GETs serve the cached encoding instead of streaming again
+    parts.append(b"]")
+    _session_mgr.store_messages_json(session, version, b"".join(parts))
+
+
+@router.delete("/sessions/{session_id}", dependencies=[Depends(_authenticate)])
+async def delete_session(session_id: str):
     """Delete a session."""
-    _validate_key(request)
     deleted = _session_mgr.delete(session_id)
     return {"deleted": deleted, "session_id": session_id}
 
@@ -118,46 +192,58 @@ async def delete_session(session_id: str, request: Request):
 
 
 @router.get("/memory/keys")
-async def list_memory_keys(request: Request, namespace: str = "default"):
+async def list_memory_keys(api_key_str: str = Depends(_authenticate), namespace: str = "default"):
     """List all memory keys in a namespace."""
-    api_key_str, _ = _validate_key(request)
     keys = _memory_store.list_keys(api_key_str, namespace)
     return {"keys": keys, "namespace": namespace, "count": len(keys)}
 
 
 @router.get("/memory/namespaces")
-async def list_namespaces(request: Request):
+async def list_namespaces(api_key_str: str = Depends(_authenticate)):
     """List all memory namespaces."""
-    api_key_str, _ = _validate_key(request)
     namespaces = _memory_store.list_namespaces(api_key_str)
     return {"namespaces": namespaces}
 
 
 @router.post("/memory")
-async def put_memory(request: Request):
-    """Store a memory entry."""
-    api_key_str, _ = _validate_key(request)
-    body = await request.json()
-
-    key = body.get("key")
-    value = body.get("value")
-    if not key or not value:
+async def put_memory(body: PutMemoryBody, api_key_str: str = Depends(_authenticate)):
+    """Store a memory entry, or a batch of entries via 'entries'."""
+    if body.entries is not None:
+        return _put_memory_batch(api_key_str, body.entries, body.namespace)
+
+    if not body.key or not body.value:
         return openai_error(400, "Both 'key' and 'value' are required", "invalid_request_error", "bad_request")
 
-    namespace = body.get("namespace", "default")
-    metadata = body.get("metadata", "{}")
-    if isinstance(metadata, dict):
-        import json
-        metadata = json.dumps(metadata)
+    metadata = _encode_metadata(body.metadata)
+    _memory_store.put(api_key_str, body.key, body.value, body.namespace, metadata)
+    return {"stored": True, "key": body.key, "namespace": body.namespace}
 
-    _memory_store.put(api_key_str, key, value, namespace, metadata)
-    return {"stored": True, "key": key, "namespace": namespace}
+
+def _put_memory_batch(api_key_str: str, entries: list[MemoryEntryBody], default_namespace: str):
+    items = []
+    for entry in entries:
+        if not entry.key or not entry.value:
+            return openai_error(400, "Every entry requires 'key' and 'value'", "invalid_request_error", "bad_request")
+        items.append((
+            entry.key,
+            entry.value,
+            entry.namespace or default_namespace,
+            _encode_metadata(entry.metadata),
+        ))
+
+    stored = _memory_store.put_many(api_key_str, items)
+    return {"stored": True, "count": stored, "keys": [item[0] for item in items]}
+
+
+def _encode_metadata(metadata: Union[dict, str]) -> str:
+    if isinstance(metadata, dict):
+        return json.dumps(metadata)
+    return metadata
 
 
 @router.get("/memory/{key}")
-async def get_memory(key: str, request: Request, namespace: str = "default"):
+async def get_memory(key: str, api_key_str: str = Depends(_authenticate), namespace: str = "default"):
     """Get a memory entry by key."""
-    api_key_str, _ = _validate_key(request)
     entry = _memory_store.get(api_key_str, key, namespace)
     if not entry:
         return openai_error(404, f"Memory key '{key}' not found", "invalid_request_error", "not_found")
@@ -173,45 +259,32 @@ async def get_memory(key: str, request: Request, namespace: str = "default"):
 
 
 @router.delete("/memory/{key}")
-async def delete_memory(key: str, request: Request, namespace: str = "default"):
+async def delete_memory(key: str, api_key_str: str = Depends(_authenticate), namespace: str = "default"):
     """Delete a memory entry."""
-    api_key_str, _ = _validate_key(request)
     deleted = _memory_store.delete(api_key_str, key, namespace)
     return {"deleted": deleted, "key": key}
 
 
 @router.post("/memory/search")
-async def search_memory(request: Request):
+async def search_memory(body: SearchMemoryBody, api_key_str: str = Depends(_authenticate)):
     """Search memory entries using semantic similarity."""
-    api_key_str, _ = _validate_key(request)
-    body = await request.json()
-
-    query = body.get("query", "")
-    namespace = body.get("namespace", "default")
-    limit = body.get("limit", 10)
-
-    results = _memory_store.search(api_key_str, query, namespace, limit)
-    return {"results": results, "query": query, "namespace": namespace}
+    results = _memory_store.search(api_key_str, body.query, body.namespace, body.limit)
+    return {"results": results, "query": body.query, "namespace": body.namespace}
 
 
 # ---------- Webhooks ----------
 
 
 @router.post("/webhooks")
-async def register_webhook(request: Request):
+async def register_webhook(body: RegisterWebhookBody, api_key_str: str = Depends(_authenticate)):
     """Register a webhook URL for async notifications."""
-    api_key_str, _ = _validate_key(request)
-    body = await request.json()
-
-    url = body.get("url")
-    if not url:
+    if not body.url:
         return openai_error(400, "'url' is required", "invalid_request_error", "bad_request")
+    if not _valid_webhook_url(body.url):
+        return openai_error(400, "'url' must be an absolute http(s) URL", "invalid_request_error", "bad_request")
 
-    webhook_id = body.get("webhook_id", f"wh-{uuid.uuid4().hex[:12]}")
-    session_id = body.get("session_id")
-    max_retries = body.get("max_retries", 3)
-
-    reg = _webhook_mgr.register(webhook_id, api_key_str, url, session_id, max_retries)
+    webhook_id = body.webhook_id or f"wh-{uuid.uuid4().hex[:12]}"
+    reg = _webhook_mgr.register(webhook_id, api_key_str, body.url, body.session_id, body.max_retries)
     return {
         "webhook_id": reg.webhook_id,
         "url": reg.url,
@@ -220,27 +293,32 @@ async def register_webhook(request: Request):
     }
 
 
+def _valid_webhook_url(url: str) -> bool:
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        return False
+    return parsed.scheme in ("http", "https") and bool(parsed.host)
+
+
 @router.get("/webhooks")
-async def list_webhooks(request: Request):
+async def list_webhooks(api_key_str: str = Depends(_authenticate)):
     """List registered webhooks."""
-    api_key_str, _ = _validate_key(request)
     webhooks = _webhook_mgr.list_webhooks(api_key_str)
     return {"webhooks": webhooks, "count": len(webhooks)}
 
 
-@router.get("/webhooks/{webhook_id}")
-async def webhook_status(webhook_id: str, request: Request):
+@router.get("/webhooks/{webhook_id}", dependencies=[Depends(_authenticate)])
+async def webhook_status(webhook_id: str):
     """Get webhook delivery status."""
-    _validate_key(request)
     status = _webhook_mgr.get_status(webhook_id)
     if not status:
         return openai_error(404, f"Webhook '{webhook_id}' not found", "invalid_request_error", "not_found")
     return status
 
 
-@router.delete("/webhooks/{webhook_id}")
-async def unregister_webhook(webhook_id: str, request: Request):
+@router.delete("/webhooks/{webhook_id}", dependencies=[Depends(_authenticate)])
+async def unregister_webhook(webhook_id: str):
     """Unregister a webhook."""
-    _validate_key(request)
     removed = _webhook_mgr.unregister(webhook_id)
     return {"removed": removed, "webhook_id": webhook_id}
@@ -8,28 +8,54 @@ messages before forwarding to vLLM, so agents don't re-send context.
 Sessions auto-expire after a configurable TTL.
 """
 
-import json
+import itertools
 import time
 import threading
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from typing import Optional
 
+import orjson
+
 
 @dataclass
 class Session:
     session_id: str
     api_key: str
-    messages: list[dict] = field(default_factory=list)
+    # System messages are kept apart from the conversation so trimming the
+    # history never has to re-scan for them.
+    system_messages: list[dict] = field(default_factory=list)
+    history: deque[dict] = field(default_factory=deque)
     created_at: float = field(default_factory=time.time)
     last_accessed: float = field(default_factory=time.time)
     metadata: dict = field(default_factory=dict)
+    # Encoded `messages`, reused until the history changes
+    _messages_json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    # Bumped on every history change, so an encoding made off the event
+    # loop can tell whether it is still current
+    messages_version: int = field(default=0, init=False, repr=False, compare=False)
 
     def touch(self):
         self.last_accessed = time.time()
 
+    def messages_json(self) -> bytes:
+        """JSON-encoded `messages`, cached until the next append."""
+        if self._messages_json is None:
+            self._messages_json = orjson.dumps(self.messages)
+        return self._messages_json
+
+    @property
+    def messages_json_cached(self) -> bool:
+        return self._messages_json is not None
+
+    @property
+    def messages(self) -> list[dict]:
+        """Full history: system messages first, then the conversation."""
+        return self.system_messages + list(self.history)
+
     @property
     def message_count(self) -> int:
-        return len(self.messages)
+        return len(self.system_messages) + len(self.history)
 
     @property
     def age_seconds(self) -> float:
@@ -43,109 +69,184 @@ class Session:
 class SessionManager:
     """Manages server-side conversation sessions for agent inference."""
 
+    # Sessions are spread over independently locked shards so requests for
+    # different sessions don't serialize on one lock.
+    NUM_SHARDS = 16
+
     def __init__(self, ttl_seconds: int = 3600, max_history: int = 100):
-        self._sessions: dict[str, Session] = {}
+        # Each shard is an OrderedDict kept in LRU order (least recently
+        # accessed first), so expired sessions are always at the front.
+        self._shards: list[tuple[threading.Lock, OrderedDict[str, Session]]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(self.NUM_SHARDS)
+        ]
         self._ttl = ttl_seconds
         self._max_history = max_history
-        self._lock = threading.Lock()
-        self._cleanup_running = False
+        # Bumped on every change visible in list_sessions(); next() on a
+        # count is atomic, so shards don't need a shared lock for it
+        self._versions = itertools.count(1)
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter that changes whenever the session set changes."""
+        return self._version
+
+    def _bump(self):
+        self._version = next(self._versions)
+
+    def _shard(self, session_id: str) -> tuple[threading.Lock, OrderedDict[str, Session]]:
+        return self._shards[hash(session_id) % self.NUM_SHARDS]
+
+    def _touch(self, sessions: OrderedDict[str, Session], session: Session):
+        session.touch()
+        sessions.move_to_end(session.session_id)
+        self._bump()
 
     def get_or_create(self, session_id: str, api_key: str) -> Session:
         """Get existing session or create new one."""
-        with self._lock:
-            session = self._sessions.get(session_id)
+        lock, sessions = self._shard(session_id)
+        with lock:
+            session = sessions.get(session_id)
             if session is None:
-                session = Session(session_id=session_id, api_key=api_key)
-                self._sessions[session_id] = session
-            session.touch()
+                session = Session(
+                    session_id=session_id,
+                    api_key=api_key,
+                    history=deque(maxlen=self._max_history),
+                )
+                sessions[session_id] = session
+            self._touch(sessions, session)
             return session
 
     def get(self, session_id: str) -> Optional[Session]:
         """Get a session by ID, or None if not found/expired."""
-        with self._lock:
-            session = self._sessions.get(session_id)
+        lock, sessions = self._shard(session_id)
+        with lock:
+            session = sessions.get(session_id)
             if session and session.idle_seconds < self._ttl:
-                session.touch()
+                self._touch(sessions, session)
                 return session
             elif session:
                 # Expired
-                del self._sessions[session_id]
+                del sessions[session_id]
+                self._bump()
             return None
 
     def append_messages(self, session_id: str, messages: list[dict]):
         """Append messages to a session's history."""
-        with self._lock:
-            session = self._sessions.get(session_id)
+        lock, sessions = self._shard(session_id)
+        with lock:
+            session = sessions.get(session_id)
             if not session:
                 return
 
-            session.messages.extend(messages)
-            session.touch()
+            for message in messages:
+                if message.get("role") == "system":
+                    session.system_messages.append(message)
+                else:
+                    session.history.append(message)
+            session._messages_json = None
+            session.messages_version += 1
+            self._touch(sessions, session)
+
+            # Trim to max history (keep system messages + last N); the deque
+            # already drops anything beyond max_history on its own
+            while session.message_count > self._max_history and session.history:
+                session.history.popleft()
 
-            # Trim to max history (keep system message + last N)
-            if len(session.messages) > self._max_history:
-                system_msgs = [m for m in session.messages if m.get("role") == "system"]
-                non_system = [m for m in session.messages if m.get("role") != "system"]
-                keep = self._max_history - len(system_msgs)
-                session.messages = system_msgs + non_system[-keep:]
+    def store_messages_json(self, session: Session, version: int, encoded: bytes):
+        """Cache an encoding of the session's messages as of `version`, unless the history has moved on."""
+        lock, _ = self._shard(session.session_id)
+        with lock:
+            if session.messages_version == version:
+                session._messages_json = encoded
 
     def get_history(self, session_id: str) -> list[dict]:
         """Get conversation history for a session."""
-        with self._lock:
-            session = self._sessions.get(session_id)
+        lock, sessions = self._shard(session_id)
+        with lock:
+            session = sessions.get(session_id)
             if session:
-                session.touch()
+                self._touch(sessions, session)
                 return list(session.messages)
             return []
 
     def delete(self, session_id: str) -> bool:
         """Delete a session."""
-        with self._lock:
-            if session_id in self._sessions:
-                del self._sessions[session_id]
-                return True
-            return False
+        lock, sessions = self._shard(session_id)
+        with lock:
+            if sessions.pop(session_id, None) is None:
+                return False
+            self._bump()
+            return True
 
     def cleanup_expired(self) -> int:
         """Remove expired sessions. Returns count of removed sessions."""
         removed = 0
-        with self._lock:
-            expired_ids = [
-                sid for sid, s in self._sessions.items()
-                if s.idle_seconds >= self._ttl
-            ]
-            for sid in expired_ids:
-                del self._sessions[sid]
-                removed += 1
+        for lock, sessions in self._shards:
+            with lock:
+                # LRU order: stop at the first session that is still live
+                while sessions:
+                    oldest = next(iter(sessions.values()))
+                    if oldest.idle_seconds < self._ttl:
+                        break
+                    sessions.popitem(last=False)
+                    removed += 1
+        if removed:
+            self._bump()
         return removed
 
+    def seconds_until_next_expiry(self) -> float:
+        """Seconds until the least recently used session expires (TTL if none)."""
+        next_expiry = None
+        for lock, sessions in self._shards:
+            with lock:
+                if sessions:
+                    oldest = next(iter(sessions.values()))
+                    expiry = oldest.last_accessed + self._ttl
+                    if next_expiry is None or expiry < next_expiry:
+                        next_expiry = expiry
+        if next_expiry is None:
+            return float(self._ttl)
+        return max(0.0, next_expiry - time.time())
+
+    def _live_sessions(self) -> list[Session]:
+        live = []
+        for lock, sessions in self._shards:
+            with lock:
+                live.extend(s for s in sessions.values() if s.idle_seconds < self._ttl)
+        return live
+
     def list_sessions(self, api_key: Optional[str] = None) -> list[dict]:
         """List active sessions, optionally filtered by API key."""
-        with self._lock:
-            sessions = self._sessions.values()
-            if api_key:
-                sessions = [s for s in sessions if s.api_key == api_key]
-
-            return [
-                {
-                    "session_id": s.session_id,
-                    "message_count": s.message_count,
-                    "created_at": s.created_at,
-                    "last_accessed": s.last_accessed,
-                    "idle_seconds": round(s.idle_seconds, 1),
-                    "metadata": s.metadata,
-                }
-                for s in sessions
-                if s.idle_seconds < self._ttl
-            ]
+        sessions = self._live_sessions()
+        if api_key:
+            sessions = [s for s in sessions if s.api_key == api_key]
+
+        return [
+            {
+                "session_id": s.session_id,
+                "message_count": s.message_count,
+                "created_at": s.created_at,
+                "last_accessed": s.last_accessed,
+                "idle_seconds": round(s.idle_seconds, 1),
+                "metadata": s.metadata,
+            }
+            for s in sessions
+        ]
 
     @property
     def active_count(self) -> int:
-        with self._lock:
-            return sum(
-                1 for s in self._sessions.values()
-                if s.idle_seconds < self._ttl
-            )
+        # Expired sessions form a prefix of each shard; count only that prefix
+        count = 0
+        for lock, sessions in self._shards:
+            with lock:
+                expired = 0
+                for s in sessions.values():
+                    if s.idle_seconds < self._ttl:
+                        break
+                    expired += 1
+                count += len(sessions) - expired
+        return count
 
     def inject_history(self, session_id: str, request_messages: list[dict]) -> list[dict]:
         """
@@ -156,16 +257,20 @@ class SessionManager:
         - Prepend session history (without system messages) before new user message
         - This lets agents send just the new user message while keeping context
         """
-        history = self.get_history(session_id)
-        if not history:
-            return request_messages
-
-        # Separate system messages from the request
-        system_msgs = [m for m in request_messages if m.get("role") == "system"]
-        new_msgs = [m for m in request_messages if m.get("role") != "system"]
+        lock, sessions = self._shard(session_id)
+        with lock:
+            session = sessions.get(session_id)
+            if not session or not (session.history or session.system_messages):
+                return request_messages
+            self._touch(sessions, session)
+            # History is stored without system messages already
+            history_msgs = list(session.history)
 
-        # Get history without system messages
-        history_msgs = [m for m in history if m.get("role") != "system"]
+        # Separate system messages from the request in one pass
+        system_msgs = []
+        new_msgs = []
+        for m in request_messages:
+            (system_msgs if m.get("role") == "system" else new_msgs).append(m)
 
         # Combine: system + history + new
         return system_msgs + history_msgs + new_msgs
@@ -12,6 +12,8 @@ Tiers:
 """
 
 import re
+import sys
+from functools import lru_cache
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -19,17 +21,51 @@ import yaml
 from pathlib import Path
 
 
-@dataclass
+@lru_cache(maxsize=256)
+def _compile(pattern: str, flags: int = re.IGNORECASE) -> re.Pattern:
+    """re.compile, memoized so reloads don't recompile unchanged rules."""
+    return re.compile(pattern, flags)
+
+
+@dataclass(slots=True)
 class TieringRule:
     pattern: str
     route_to: str  # "classification_model", "reasoning_model", "default_model"
     compiled: re.Pattern = field(init=False, repr=False)
+    # Model name route_to points at, filled in when the config is loaded
+    resolved_model: str = field(default="", init=False)
 
     def __post_init__(self):
-        self.compiled = re.compile(self.pattern, re.IGNORECASE)
+        self.compiled = _compile(self.pattern, re.IGNORECASE)
+
+
+# Backreferences would point at the wrong group once patterns are combined
+_BACKREF_RE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def _combine_rules(rules: list[TieringRule]) -> Optional[re.Pattern]:
+    """
+    Compile rules into one pattern whose match names the first rule, in
+    rule order, that matches anywhere in the text.
 
+    Each rule becomes an anchored lookahead alternative, so the regex
+    engine tries them in order in C instead of a Python loop calling
+    search() per rule. Plain alternation would pick the leftmost match in
+    the text instead, which changes which rule wins. Returns None if the
+    rules can't be combined safely.
+    """
+    if not rules or any(_BACKREF_RE.search(r.pattern) for r in rules):
+        return None
+    alternatives = "|".join(
+        f"(?=[\\s\\S]*?(?:{rule.pattern})(?P<r{i}>))" for i, rule in enumerate(rules)
+    )
+    try:
+        return _compile(f"\\A(?:{alternatives})", re.IGNORECASE)
+    except re.error:
+        return None
 
-@dataclass
+
+@dataclass(slots=True)
 class TieringConfig:
     classification_model: str = ""
     reasoning_model: str = ""
@@ -43,6 +79,11 @@ class ModelTiering:
     def __init__(self, config_path: str = "infrastructure/config/models.yaml"):
         self._config = TieringConfig()
         self._config_path = config_path
+        # Rules that route to a configured model, plus their combined matcher
+        self._active_rules: list[TieringRule] = []
+        self._rule_matcher: Optional[re.Pattern] = None
+        # Tier name -> model name, rebuilt on reload
+        self._tier_map: dict[str, str] = {}
         self.reload()
 
     def reload(self):
@@ -67,15 +108,38 @@ class ModelTiering:
                 for r in tiering.get("rules", [])
             ],
         )
+        self._tier_map = {
+            "classification_model": self._config.classification_model,
+            "classification": self._config.classification_model,
+            "reasoning_model": self._config.reasoning_model,
+            "reasoning": self._config.reasoning_model,
+            "default_model": self._config.default_model,
+            "default": self._config.default_model,
+        }
+        # Intern the targets, as ModelRouter does its keys, so resolving a
+        # tiered model in the router matches on identity
+        for tier, model in self._tier_map.items():
+            if isinstance(model, str):
+                self._tier_map[tier] = sys.intern(model)
+        for rule in self._config.rules:
+            rule.resolved_model = self._resolve_tier(rule.route_to)
+        # A rule whose tier maps to no model can never win, so drop it here
+        # rather than checking on every request
+        self._active_rules = [r for r in self._config.rules if r.resolved_model]
+        self._rule_matcher = _combine_rules(self._active_rules)
 
     def resolve_model(self, messages: list[dict],
                       requested_model: Optional[str] = None,
-                      tier_hint: Optional[str] = None) -> str:
+                      tier_hint: Optional[str] = None,
+                      last_user_text: Optional[str] = None) -> str:
         """
         Determine which model to use based on:
         1. Explicit tier hint from header (X-Gonka-Tier: reasoning|classification|default)
         2. Rule matching on message content
         3. Default model
+
+        Callers that already know the last user message can pass it as
+        last_user_text to skip scanning `messages` for it.
         """
         # Explicit tier hint takes priority
         if tier_hint:
@@ -88,43 +152,48 @@ class ModelTiering:
             return requested_model
 
         # Rule-based routing on last user message
-        last_user_msg = self._get_last_user_message(messages)
-        if last_user_msg:
-            for rule in self._config.rules:
-                if rule.compiled.search(last_user_msg):
-                    model = self._resolve_tier(rule.route_to)
-                    if model:
-                        return model
+        if last_user_text is None:
+            last_user_text = self._get_last_user_message(messages)
+        if last_user_text:
+            rule = self._match_rule(last_user_text)
+            if rule:
+                return rule.resolved_model
 
         # Default
         return self._config.default_model or ""
 
+    def _match_rule(self, text: str) -> Optional[TieringRule]:
+        """First active rule (in config order) matching the text."""
+        if self._rule_matcher is not None:
+            match = self._rule_matcher.match(text)
+            if match:
+                return self._active_rules[int(match.lastgroup[1:])]
+            return None
+        for rule in self._active_rules:
+            if rule.compiled.search(text):
+                return rule
+        return None
+
     def _resolve_tier(self, tier: str) -> str:
         """Map tier name to actual model name."""
-        mapping = {
-            "classification_model": self._config.classification_model,
-            "classification": self._config.classification_model,
-            "reasoning_model": self._config.reasoning_model,
-            "reasoning": self._config.reasoning_model,
-            "default_model": self._config.default_model,
-            "default": self._config.default_model,
-        }
-        return mapping.get(tier, "")
+        return self._tier_map.get(tier, "")
 
     def _get_last_user_message(self, messages: list[dict]) -> str:
         """Extract the last user message content."""
-        for msg in reversed(messages):
+        # Indexed scan from the end; the user turn is almost always last
+        for i in range(len(messages) - 1, -1, -1):
+            msg = messages[i]
             if msg.get("role") == "user":
                 content = msg.get("content", "")
                 if isinstance(content, str):
                     return content
                 elif isinstance(content, list):
                     # Multimodal content
-                    return " ".join(
+                    return " ".join([
                         part.get("text", "")
                         for part in content
                         if part.get("type") == "text"
-                    )
+                    ])
         return ""
 
     @property
@@ -6,18 +6,60 @@ when long-running inference requests complete. Useful for:
 - Long-context reasoning that takes >30s
 - Background batch processing
 - Agent frameworks with async execution patterns
+
+notify() only queues the delivery in SQLite (webhook_jobs) and returns.
+Worker coroutines started by run() pick up due jobs and deliver them,
+rescheduling failed attempts with backoff. Jobs that exhaust their
+retries or are rejected by the receiver move to webhook_dead_letter.
+Queued jobs carry their own URL and payload, so a restart doesn't lose
+pending deliveries even though registrations live in memory. Several
+processes can share the database: each claims jobs atomically under its
+own owner id, and a dead process's claims are released once their lease
+(CLAIM_LEASE_SECONDS) runs out.
 """
 
 import asyncio
-import json
+import random
+import sqlite3
 import time
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Optional
 
 import httpx
+import orjson
+
+# Cap on a single backoff delay, in seconds
+MAX_BACKOFF_SECONDS = 30.0
+
+# Due jobs fetched per poll, and the longest a worker idles between polls
+POLL_BATCH_SIZE = 32
+POLL_INTERVAL_SECONDS = 1.0
+
+# A claim older than this is taken to belong to a process that died, and
+# the job becomes due again. Far longer than a poll batch takes to deliver.
+CLAIM_LEASE_SECONDS = 300.0
+
+# Selecting and claiming in one statement, so two processes sharing the
+# database can never both pick up the same job
+_CLAIM_DUE_SQL = """
+    UPDATE webhook_jobs SET claimed = ?, claimed_at = ?
+    WHERE id IN (
+        SELECT id FROM webhook_jobs
+        WHERE next_attempt_at <= ? AND claimed = 0
+        ORDER BY next_attempt_at
+        LIMIT ?
+    )
+    RETURNING id, webhook_id, url, body_prefix, attempts, max_retries, timeout_seconds
+"""
+
+_RECLAIM_EXPIRED_SQL = """
+    UPDATE webhook_jobs SET claimed = 0, claimed_at = NULL
+    WHERE claimed != 0 AND COALESCE(claimed_at, 0) < ?
+"""
 
 
-@dataclass
+@dataclass(slots=True)
 class WebhookRegistration:
     webhook_id: str
     api_key: str
@@ -28,7 +70,7 @@ class WebhookRegistration:
     timeout_seconds: float = 10.0
 
 
-@dataclass
+@dataclass(slots=True)
 class WebhookDelivery:
     webhook_id: str
     status: str  # "pending", "delivered", "failed"
@@ -41,9 +83,78 @@ class WebhookDelivery:
 class WebhookManager:
     """Manages webhook registrations and async delivery."""
 
-    def __init__(self):
+    def __init__(self, db_path: str = "data/webhooks.db", max_in_flight: int = 64):
         self._registrations: dict[str, WebhookRegistration] = {}
         self._deliveries: dict[str, WebhookDelivery] = {}
+        # api_key -> {webhook_id: registration}, in registration order, so
+        # per-tenant listing doesn't scan every tenant's webhooks
+        self._by_api_key: dict[str, dict[str, WebhookRegistration]] = {}
+        # One pooled client for all deliveries; per-webhook timeouts are
+        # applied per request
+        self._client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        # Caps concurrent delivery attempts so a slow receiver can't pile
+        # up unbounded in-flight requests; backoff sleeps don't hold it
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._jobs: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        # Marks this process's claims in webhook_jobs.claimed (0 = unclaimed)
+        self._owner = random.getrandbits(62) | 1
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Only touched from the event loop; every statement is a small
+        # single-row write or an indexed range read
+        self._db = sqlite3.connect(db_path, isolation_level=None)
+        self._init_db()
+
+    def _init_db(self):
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                webhook_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                body_prefix BLOB NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_retries INTEGER NOT NULL,
+                timeout_seconds REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                claimed INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                created_at REAL NOT NULL
+            )
+        """)
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(webhook_jobs)")}
+        if "claimed_at" not in columns:
+            self._db.execute("ALTER TABLE webhook_jobs ADD COLUMN claimed_at REAL")
+        self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_webhook_jobs_due
+            ON webhook_jobs(next_attempt_at) WHERE claimed = 0
+        """)
+        self._db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_webhook_jobs_claimed
+            ON webhook_jobs(claimed_at) WHERE claimed != 0
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_dead_letter (
+                id INTEGER PRIMARY KEY,
+                webhook_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                body_prefix BLOB NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_status_code INTEGER NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                failed_at REAL NOT NULL
+            )
+        """)
+
+    async def aclose(self):
+        """Close pooled connections and the job queue (call on shutdown)."""
+        await self._client.aclose()
+        self._db.close()
 
     def register(self, webhook_id: str, api_key: str, url: str,
                  session_id: Optional[str] = None,
@@ -56,7 +167,11 @@ class WebhookManager:
             session_id=session_id,
             max_retries=max_retries,
         )
+        previous = self._registrations.get(webhook_id)
+        if previous is not None:
+            self._index_remove(previous)
         self._registrations[webhook_id] = reg
+        self._by_api_key.setdefault(api_key, {})[webhook_id] = reg
         self._deliveries[webhook_id] = WebhookDelivery(
             webhook_id=webhook_id,
             status="pending",
@@ -65,57 +180,169 @@ class WebhookManager:
 
     def unregister(self, webhook_id: str) -> bool:
         """Remove a webhook registration."""
-        if webhook_id in self._registrations:
-            del self._registrations[webhook_id]
-            self._deliveries.pop(webhook_id, None)
-            return True
-        return False
+        reg = self._registrations.pop(webhook_id, None)
+        if reg is None:
+            return False
+        self._index_remove(reg)
+        self._deliveries.pop(webhook_id, None)
+        return True
+
+    def _index_remove(self, reg: WebhookRegistration):
+        tenant = self._by_api_key.get(reg.api_key)
+        if tenant is not None:
+            tenant.pop(reg.webhook_id, None)
+            if not tenant:
+                del self._by_api_key[reg.api_key]
 
     async def notify(self, webhook_id: str, payload: dict) -> bool:
         """
-        Deliver a webhook notification with retries.
-        Returns True if delivered successfully.
+        Queue a webhook notification for delivery.
+        Returns True if queued; get_status() reports the outcome.
         """
         reg = self._registrations.get(webhook_id)
         if not reg:
             return False
 
-        delivery = self._deliveries[webhook_id]
+        # Encode the static part once; only the timestamp changes per attempt
+        body_prefix = orjson.dumps({
+            "webhook_id": webhook_id,
+            "session_id": reg.session_id,
+            "data": payload,
+        })[:-1] + b',"timestamp":'
+
+        now = time.time()
+        self._db.execute(
+            """INSERT INTO webhook_jobs
+               (webhook_id, url, body_prefix, max_retries, timeout_seconds,
+                next_attempt_at, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (webhook_id, reg.url, body_prefix, reg.max_retries,
+             reg.timeout_seconds, now, now),
+        )
+        self._deliveries[webhook_id].status = "pending"
+        self._wakeup.set()
+        return True
+
+    async def run(self, workers: int = 4):
+        """Background task: poll due jobs and deliver them with N workers."""
+        for _ in range(workers):
+            asyncio.create_task(self._worker())
+        while True:
+            now = time.time()
+            # Other processes may share the database, so only claims whose
+            # lease ran out (their owner died mid-delivery) are released
+            self._db.execute(_RECLAIM_EXPIRED_SQL, (now - CLAIM_LEASE_SECONDS,))
+            rows = self._db.execute(
+                _CLAIM_DUE_SQL, (self._owner, now, now, POLL_BATCH_SIZE)
+            ).fetchall()
+            if rows:
+                for row in rows:
+                    self._jobs.put_nowait(row)
+                if len(rows) == POLL_BATCH_SIZE:
+                    # More may be due; let the workers drain, then poll again
+                    await self._jobs.join()
+                    continue
 
-        for attempt in range(reg.max_retries):
-            delivery.attempts = attempt + 1
-            delivery.last_attempt = time.time()
+            self._wakeup.clear()
+            wait = POLL_INTERVAL_SECONDS
+            row = self._db.execute(
+                "SELECT MIN(next_attempt_at) FROM webhook_jobs WHERE claimed = 0"
+            ).fetchone()
+            if row[0] is not None:
+                wait = max(0.0, min(wait, row[0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
 
+    async def _worker(self):
+        while True:
+            job = await self._jobs.get()
             try:
-                async with httpx.AsyncClient(timeout=reg.timeout_seconds) as client:
-                    resp = await client.post(
-                        reg.url,
-                        json={
-                            "webhook_id": webhook_id,
-                            "session_id": reg.session_id,
-                            "timestamp": time.time(),
-                            "data": payload,
-                        },
-                        headers={
-                            "Content-Type": "application/json",
-                            "X-Gonka-Webhook-ID": webhook_id,
-                        },
-                    )
-                    delivery.last_status_code = resp.status_code
-
-                    if 200 <= resp.status_code < 300:
-                        delivery.status = "delivered"
-                        return True
-
-            except (httpx.ConnectError, httpx.TimeoutException) as e:
-                delivery.last_error = str(e)
-
-            # Exponential backoff
-            if attempt < reg.max_retries - 1:
-                await asyncio.sleep(2 ** attempt)
-
-        delivery.status = "failed"
-        return False
+                await self._deliver(*job)
+            except Exception as e:
+                # Never let one bad job take the worker down with it
+                print(f"  Webhook job {job[0]} failed: {e!r}")
+                try:
+                    self._dead_letter(job[0], job[4] + 1, 0, repr(e))
+                except sqlite3.Error as db_error:
+                    print(f"  Failed to dead-letter webhook job {job[0]}: {db_error}")
+            finally:
+                self._jobs.task_done()
+
+    async def _deliver(self, job_id: int, webhook_id: str, url: str, body_prefix: bytes,
+                       attempts: int, max_retries: int, timeout_seconds: float):
+        """Make one delivery attempt, then complete, reschedule or dead-letter the job."""
+        attempts += 1
+        # Registrations don't survive restarts; jobs queued before one still deliver
+        delivery = self._deliveries.get(webhook_id)
+        if delivery is None:
+            delivery = WebhookDelivery(webhook_id=webhook_id, status="pending")
+        delivery.attempts = attempts
+        delivery.last_attempt = time.time()
+        retry_after = None
+        permanent = False
+
+        try:
+            async with self._in_flight:
+                resp = await self._client.post(
+                    url,
+                    content=body_prefix + orjson.dumps(time.time()) + b"}",
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Gonka-Webhook-ID": webhook_id,
+                    },
+                    timeout=timeout_seconds,
+                )
+            delivery.last_status_code = resp.status_code
+
+            if 200 <= resp.status_code < 300:
+                delivery.status = "delivered"
+                self._db.execute("DELETE FROM webhook_jobs WHERE id = ?", (job_id,))
+                return
+            # The receiver rejected the payload; retrying won't help
+            permanent = 400 <= resp.status_code < 500 and resp.status_code != 429
+            retry_after = _parse_retry_after(resp.headers.get("retry-after"))
+
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+            # The URL itself is unusable; retrying won't help
+            delivery.last_error = str(e)
+            permanent = True
+        except httpx.TransportError as e:
+            delivery.last_error = str(e)
+
+        if permanent or attempts >= max_retries:
+            delivery.status = "failed"
+            self._dead_letter(job_id, attempts, delivery.last_status_code, delivery.last_error)
+            return
+
+        # Capped exponential backoff with jitter, so webhooks failing
+        # together don't retry in lockstep; Retry-After wins if given
+        delay = min(MAX_BACKOFF_SECONDS, 2 ** (attempts - 1)) * (0.5 + random.random() * 0.5)
+        if retry_after is not None:
+            delay = min(MAX_BACKOFF_SECONDS, retry_after)
+        self._db.execute(
+            """UPDATE webhook_jobs
+               SET attempts = ?, next_attempt_at = ?, claimed = 0, claimed_at = NULL
+               WHERE id = ? AND claimed = ?""",
+            (attempts, time.time() + delay, job_id, self._owner),
+        )
+        self._wakeup.set()
+
+    def _dead_letter(self, job_id: int, attempts: int, last_status_code: int,
+                     last_error: Optional[str]):
+        """Move a job to webhook_dead_letter for good."""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                """INSERT INTO webhook_dead_letter
+                   (id, webhook_id, url, body_prefix, attempts, last_status_code,
+                    last_error, created_at, failed_at)
+                   SELECT id, webhook_id, url, body_prefix, ?, ?, ?, created_at, ?
+                   FROM webhook_jobs WHERE id = ?""",
+                (attempts, last_status_code, last_error, time.time(), job_id),
+            )
+            self._db.execute("DELETE FROM webhook_jobs WHERE id = ?", (job_id,))
 
     async def notify_completion(self, webhook_id: str, response: dict):
         """Notify that an inference request has completed."""
@@ -145,9 +372,19 @@ class WebhookManager:
                 "webhook_id": reg.webhook_id,
                 "url": reg.url,
                 "session_id": reg.session_id,
-                "status": self._deliveries.get(reg.webhook_id, WebhookDelivery(webhook_id="")).status,
+                # register() always creates the delivery record alongside
+                "status": self._deliveries[reg.webhook_id].status,
                 "created_at": reg.created_at,
             }
-            for reg in self._registrations.values()
-            if reg.api_key == api_key
+            for reg in self._by_api_key.get(api_key, {}).values()
         ]
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds (the HTTP-date form is ignored)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
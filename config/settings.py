@@ -31,10 +31,18 @@ class Settings:
     # vLLM backends
     vllm_base_url: str = field(default_factory=lambda: os.getenv("GONKA_VLLM_URL", "http://localhost:8000"))
 
+    # Backpressure (adaptive per-backend concurrency limit)
+    backend_max_concurrency: int = field(default_factory=lambda: int(os.getenv("GONKA_BACKEND_MAX_CONCURRENCY", "256")))
+    backend_min_concurrency: int = field(default_factory=lambda: int(os.getenv("GONKA_BACKEND_MIN_CONCURRENCY", "4")))
+    backend_target_latency_ms: float = field(default_factory=lambda: float(os.getenv("GONKA_BACKEND_TARGET_LATENCY_MS", "30000")))
+
     # Auth
     api_keys_file: str = field(default_factory=lambda: os.getenv("GONKA_API_KEYS_FILE", ""))
     admin_api_key: str = field(default_factory=lambda: os.getenv("GONKA_ADMIN_API_KEY", ""))
 
+    # Admin API
+    admin_cache_ttl_seconds: float = field(default_factory=lambda: float(os.getenv("GONKA_ADMIN_CACHE_TTL", "10")))
+
     # Rate limiting
     default_rpm: int = field(default_factory=lambda: int(os.getenv("GONKA_DEFAULT_RPM", "60")))
     default_tpm: int = field(default_factory=lambda: int(os.getenv("GONKA_DEFAULT_TPM", "100000")))
@@ -46,6 +54,7 @@ class Settings:
     # Memory
     memory_backend: str = field(default_factory=lambda: os.getenv("GONKA_MEMORY_BACKEND", "sqlite"))
     memory_db_path: str = field(default_factory=lambda: os.getenv("GONKA_MEMORY_DB", "data/memory.db"))
+    memory_embedding_model: str = field(default_factory=lambda: os.getenv("GONKA_MEMORY_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"))
 
     # Data directory
     data_dir: str = field(default_factory=lambda: os.getenv("GONKA_DATA_DIR", "data"))
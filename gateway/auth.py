@@ -3,20 +3,37 @@ API Key Authentication for Gonka.ai gateway.
 
 Validates Bearer tokens against stored API keys.
 Keys are stored in a JSON file with per-key metadata (tier, rate limits, owner).
+Only SHA-256 digests of the keys are kept, in memory and on disk, plus a
+short hint for display; the plaintext key is shown once, at creation.
+
+Mutations mark the key set dirty; a background task (flush_periodically)
+writes the file at most once a second, off the event loop.
 """
 
-import json
+import asyncio
+import hashlib
+import os
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
+import orjson
 from fastapi import HTTPException, Request
 
 
-@dataclass
+def hash_key(key: str) -> bytes:
+    return hashlib.sha256(key.encode()).digest()
+
+
+def _key_hint(key: str) -> str:
+    return key[:8] + "..." + key[-4:]
+
+
+@dataclass(slots=True)
 class APIKey:
-    key: str
+    key_hash: bytes
+    key_hint: str
     owner: str
     tier: str = "standard"  # "free", "standard", "premium"
     rpm_limit: int = 60
@@ -29,26 +46,70 @@ class AuthManager:
     """Manages API keys and validates requests."""
 
     def __init__(self, keys_file: str = ""):
-        self._keys: dict[str, APIKey] = {}
+        # Both keyed by hash_key(key)
+        self._keys: dict[bytes, APIKey] = {}
+        # Active keys only, so validate() is a single lookup
+        self._active: dict[bytes, APIKey] = {}
         self._keys_file = keys_file
+        self._dirty = False
         if keys_file and Path(keys_file).exists():
             self._load_keys(keys_file)
 
     def _load_keys(self, filepath: str):
-        with open(filepath) as f:
-            data = json.load(f)
+        with open(filepath, "rb") as f:
+            data = orjson.loads(f.read())
+        legacy = False
+        # The decoded entries are ours to mutate in place
         for entry in data.get("keys", []):
+            if "key" in entry:
+                # Older files stored the plaintext key
+                plaintext = entry.pop("key")
+                entry["key_hash"] = hash_key(plaintext)
+                entry["key_hint"] = _key_hint(plaintext)
+                legacy = True
+            else:
+                entry["key_hash"] = bytes.fromhex(entry["key_hash"])
             key = APIKey(**entry)
-            self._keys[key.key] = key
+            self._keys[key.key_hash] = key
+            if key.active:
+                self._active[key.key_hash] = key
+        if legacy:
+            # Rewrite the file so the plaintext keys don't stay on disk
+            self.save_keys(filepath)
 
     def save_keys(self, filepath: str = ""):
+        """Write the keys file now."""
         filepath = filepath or self._keys_file
         if not filepath:
             return
+        self._dirty = False
+        _write_atomic(filepath, self._serialize())
+
+    async def flush(self):
+        """Write the keys file if anything changed, without blocking the loop."""
+        if not self._dirty or not self._keys_file:
+            return
+        self._dirty = False
+        # Snapshot on the loop, write in a thread
+        data = self._serialize()
+        try:
+            await asyncio.to_thread(_write_atomic, self._keys_file, data)
+        except OSError as e:
+            self._dirty = True
+            print(f"  Failed to save API keys: {e}")
+
+    async def flush_periodically(self, interval: float = 1.0):
+        """Background task: coalesce key changes into one write per interval."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def _serialize(self) -> bytes:
         data = {
             "keys": [
                 {
-                    "key": k.key,
+                    "key_hash": k.key_hash.hex(),
+                    "key_hint": k.key_hint,
                     "owner": k.owner,
                     "tier": k.tier,
                     "rpm_limit": k.rpm_limit,
@@ -59,38 +120,38 @@ class AuthManager:
                 for k in self._keys.values()
             ]
         }
-        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
 
     def add_key(self, key: str, owner: str, tier: str = "standard",
                 rpm_limit: int = 60, tpm_limit: int = 100_000) -> APIKey:
         api_key = APIKey(
-            key=key, owner=owner, tier=tier,
+            key_hash=hash_key(key), key_hint=_key_hint(key), owner=owner, tier=tier,
             rpm_limit=rpm_limit, tpm_limit=tpm_limit,
         )
-        self._keys[key] = api_key
-        self.save_keys()
+        self._keys[api_key.key_hash] = api_key
+        self._active[api_key.key_hash] = api_key
+        self._dirty = True
         return api_key
 
     def revoke_key(self, key: str) -> bool:
-        if key in self._keys:
-            self._keys[key].active = False
-            self.save_keys()
+        digest = hash_key(key)
+        if digest in self._keys:
+            self._keys[digest].active = False
+            self._active.pop(digest, None)
+            self._dirty = True
             return True
         return False
 
     def validate(self, key: str) -> Optional[APIKey]:
         """Validate an API key. Returns APIKey if valid, None otherwise."""
-        api_key = self._keys.get(key)
-        if api_key and api_key.active:
-            return api_key
-        return None
+        # Looking up the digest means no comparison ever runs against the
+        # secret itself, so lookup time doesn't leak a matching prefix
+        return self._active.get(hash_key(key))
 
     def list_keys(self) -> list[dict]:
         return [
             {
-                "key": k.key[:8] + "..." + k.key[-4:],
+                "key": k.key_hint,
                 "owner": k.owner,
                 "tier": k.tier,
                 "active": k.active,
@@ -104,9 +165,23 @@ class AuthManager:
         return len(self._keys)
 
 
+def _write_atomic(filepath: str, data: bytes):
+    # Write a sibling temp file and rename over the original, so a crash
+    # mid-write never leaves a truncated keys file
+    path = Path(filepath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
 def extract_api_key(request: Request) -> str:
     """Extract API key from Authorization header."""
-    auth_header = request.headers.get("authorization", "")
+    return api_key_from_header(request.headers.get("authorization", ""))
+
+
+def api_key_from_header(auth_header: str) -> str:
+    """Extract API key from an Authorization header value."""
     if auth_header.startswith("Bearer "):
         return auth_header[7:]
     raise HTTPException(
@@ -0,0 +1,102 @@
+"""
+Backpressure for Gonka.ai gateway → vLLM forwarding.
+
+Caps concurrent requests per backend with an AIMD (additive-increase,
+multiplicative-decrease) limit, like TCP congestion control:
+- every WINDOW completed requests, raise the limit by 0.5 if average
+  latency stayed within target, otherwise halve it
+- halve it immediately on a connection error, 429 or 5xx
+
+A circuit breaker sits on top: after FAILURE_THRESHOLD consecutive
+failures the backend is considered down for COOLDOWN_SECONDS and requests
+fail fast instead of queueing behind it.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class BackendUnavailable(Exception):
+    """Raised when a backend's circuit breaker is open."""
+
+
+class Backpressure:
+    """Adaptive concurrency limit and circuit breaker for one backend."""
+
+    WINDOW = 20
+    FAILURE_THRESHOLD = 5
+    COOLDOWN_SECONDS = 10.0
+
+    def __init__(self, max_concurrency: int = 256, min_concurrency: int = 4,
+                 target_latency_ms: float = 30_000.0):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.target_latency_ms = target_latency_ms
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._latencies: list[float] = []
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+    @property
+    def circuit_open(self) -> bool:
+        return self._open_until > time.time()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot for the duration of an upstream call."""
+        if self.circuit_open:
+            raise BackendUnavailable()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                # Wake one waiter per free slot, so a limit that grew since
+                # the last release lets more than one through
+                self._cond.notify(int(self.limit) - self.in_flight)
+
+    def record_success(self, latency_ms: float):
+        self._consecutive_failures = 0
+        self._latencies.append(latency_ms)
+        if len(self._latencies) < self.WINDOW:
+            return
+        avg = sum(self._latencies) / len(self._latencies)
+        self._latencies.clear()
+        if avg <= self.target_latency_ms:
+            self._set_limit(self.limit + 0.5)
+        else:
+            self._set_limit(self.limit * 0.5)
+
+    def record_failure(self):
+        self._set_limit(self.limit * 0.5)
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.FAILURE_THRESHOLD:
+            # Half-open after the cooldown: the next failure re-opens it
+            self._open_until = time.time() + self.COOLDOWN_SECONDS
+            self._consecutive_failures = self.FAILURE_THRESHOLD - 1
+
+    def _set_limit(self, limit: float):
+        # Waiters only exist while every slot is taken, so the next release
+        # notices a raised limit; no separate wake-up is needed
+        self.limit = max(self.min_concurrency, min(self.max_concurrency, limit))
+
+
+class BackpressureRegistry:
+    """One Backpressure per backend URL, created on first use."""
+
+    def __init__(self, max_concurrency: int = 256, min_concurrency: int = 4,
+                 target_latency_ms: float = 30_000.0):
+        self._config = (max_concurrency, min_concurrency, target_latency_ms)
+        self._backends: dict[str, Backpressure] = {}
+
+    def get(self, backend_url: str) -> Backpressure:
+        bp = self._backends.get(backend_url)
+        if bp is None:
+            bp = self._backends[backend_url] = Backpressure(*self._config)
+        return bp
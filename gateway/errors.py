@@ -11,7 +11,9 @@ All errors follow the OpenAI error format:
 }
 """
 
+import httpx
 from fastapi import Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
 
@@ -68,6 +70,26 @@ def backend_unavailable(model: str) -> JSONResponse:
     )
 
 
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    """Report request body/parameter validation failures as OpenAI-format 400s."""
+    errors = exc.errors()
+    if not errors:
+        return bad_request("Invalid request")
+    first = errors[0]
+    if first.get("type") == "json_invalid":
+        return bad_request("Invalid JSON body")
+    field = ".".join(str(part) for part in first.get("loc", ()) if part != "body")
+    if field:
+        return bad_request(f"Invalid '{field}': {first.get('msg', 'invalid value')}")
+    return bad_request(first.get("msg", "Invalid request body"))
+
+
+async def upstream_exception_handler(request: Request, exc: httpx.HTTPError) -> JSONResponse:
+    """Upstream HTTP failures not handled at the call site: report a 503
+    without stringifying the exception (and its request/response)."""
+    return backend_unavailable("upstream")
+
+
 async def generic_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Catch-all exception handler that returns OpenAI-format errors."""
     return server_error(str(exc))
@@ -11,23 +11,29 @@ Usage:
 import asyncio
 import json
 import time
-from typing import Optional
+from typing import Any, Optional, Union
 
 import httpx
-from fastapi import FastAPI, Request, Response
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, StreamingResponse
 
 from config.settings import get_settings
-from gateway.auth import AuthManager, extract_api_key
+from gateway.auth import APIKey, AuthManager, api_key_from_header
 from gateway.errors import (
     backend_unavailable,
     generic_exception_handler,
     openai_error,
+    upstream_exception_handler,
+    validation_exception_handler,
 )
+from gateway.backpressure import BackendUnavailable, Backpressure, BackpressureRegistry
 from gateway.metering import UsageMeter, UsageRecord
 from gateway.rate_limit import RateLimiter
 from gateway.router import ModelRouter
 from agent.sessions import SessionManager
+from agent.embeddings import Embedder
 from agent.memory import MemoryStore
 from agent.webhooks import WebhookManager
 from agent.routes import router as agent_router, init_agent_routes
@@ -52,10 +58,32 @@ session_manager = SessionManager(
     ttl_seconds=settings.session_ttl_seconds,
     max_history=settings.session_max_history,
 )
-memory_store = MemoryStore(db_path=settings.memory_db_path)
-webhook_manager = WebhookManager()
+memory_store = MemoryStore(
+    db_path=settings.memory_db_path,
+    embedder=(
+        Embedder(settings.memory_embedding_model, cache_dir=f"{settings.data_dir}/models")
+        if settings.memory_backend == "sqlite-vec" else None
+    ),
+)
+webhook_manager = WebhookManager(db_path=f"{settings.data_dir}/webhooks.db")
 model_tiering = ModelTiering()
 health_checker = HealthChecker(vllm_base_url=settings.vllm_base_url)
+backpressure = BackpressureRegistry(
+    max_concurrency=settings.backend_max_concurrency,
+    min_concurrency=settings.backend_min_concurrency,
+    target_latency_ms=settings.backend_target_latency_ms,
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# Streamed bytes are forwarded as-is, so they must not be content-encoded
+_STREAM_HEADERS = {**_JSON_HEADERS, "Accept-Encoding": "identity"}
+_SSE_TAIL_BYTES = 16384
+# Turns accepted by one /v1/sessions/{id}/batch call
+MAX_BATCH_TURNS = 16
+
+# Shared upstream client, opened at startup: pooled keep-alive connections
+# to the vLLM backends instead of a new client (and handshake) per request
+http_client: Optional[httpx.AsyncClient] = None
 
 # Initialize agent routes with shared managers
 init_agent_routes(session_manager, memory_store, webhook_manager, auth_manager)
@@ -65,6 +93,8 @@ app.include_router(agent_router)
 init_admin_routes(auth_manager, usage_meter, model_router, session_manager, model_tiering, health_checker)
 app.include_router(admin_router)
 
+app.add_exception_handler(RequestValidationError, validation_exception_handler)
+app.add_exception_handler(httpx.HTTPError, upstream_exception_handler)
 app.add_exception_handler(Exception, generic_exception_handler)
 
 
@@ -74,8 +104,7 @@ app.add_exception_handler(Exception, generic_exception_handler)
 @app.get("/v1/models")
 async def list_models():
     """List available models (OpenAI-compatible)."""
-    models = model_router.list_models()
-    return {"object": "list", "data": models}
+    return Response(content=model_router.models_json, media_type="application/json")
 
 
 @app.post("/v1/chat/completions")
@@ -86,8 +115,14 @@ async def chat_completions(request: Request):
     """
     start_time = time.time()
 
+    # Read every header this handler needs up front
+    headers = request.headers
+    auth_header = headers.get("authorization", "")
+    tier_hint = headers.get("x-gonka-tier")
+    session_id = headers.get("x-gonka-session-id")
+
     # Auth
-    api_key_str = extract_api_key(request)
+    api_key_str = api_key_from_header(auth_header)
     api_key = auth_manager.validate(api_key_str)
     if not api_key:
         return openai_error(401, "Invalid API key", "invalid_request_error", "invalid_api_key")
@@ -97,10 +132,121 @@ async def chat_completions(request: Request):
 
     # Parse request body
     try:
-        body = await request.json()
-    except json.JSONDecodeError:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
         return openai_error(400, "Invalid JSON body", "invalid_request_error", "bad_request")
 
+    prepared = _prepare_chat(body, api_key_str, api_key, tier_hint, session_id)
+    if isinstance(prepared, Response):
+        return prepared
+    model_name, backend_url, body_bytes = prepared
+
+    # Forward to vLLM backend
+    is_streaming = body.get("stream", False)
+
+    if is_streaming:
+        return await _stream_response(
+            backend_url, body, body_bytes, api_key_str, model_name,
+            session_id, start_time,
+        )
+    else:
+        return await _forward_response(
+            backend_url, body, body_bytes, api_key_str, model_name,
+            session_id, start_time,
+        )
+
+
+@app.post("/v1/sessions/{session_id}/batch")
+async def session_batch(session_id: str, request: Request):
+    """
+    Run several chat turns against one session in a single round trip.
+
+    Turns run in order, each seeing the history the previous ones left,
+    and each goes through the same rate limits, routing and metering as
+    /v1/chat/completions. The batch stops at the first failing turn; its
+    error comes back with the completed turns' results and its index.
+    """
+    headers = request.headers
+    tier_hint = headers.get("x-gonka-tier")
+
+    api_key_str = api_key_from_header(headers.get("authorization", ""))
+    api_key = auth_manager.validate(api_key_str)
+    if not api_key:
+        return openai_error(401, "Invalid API key", "invalid_request_error", "invalid_api_key")
+
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return openai_error(400, "Invalid JSON body", "invalid_request_error", "bad_request")
+
+    turns = body.get("batch") if isinstance(body, dict) else None
+    if not isinstance(turns, list) or not 0 < len(turns) <= MAX_BATCH_TURNS:
+        return openai_error(400, f"'batch' must be a list of 1-{MAX_BATCH_TURNS} requests",
+                            "invalid_request_error", "bad_request")
+    if not all(isinstance(turn, dict) and not turn.get("stream") for turn in turns):
+        return openai_error(400, "Batch turns must be non-streaming chat requests",
+                            "invalid_request_error", "bad_request")
+
+    results = []
+    for index, turn in enumerate(turns):
+        start_time = time.time()
+        try:
+            rate_limiter.check_request(api_key_str, api_key.rpm_limit)
+            prepared = _prepare_chat(turn, api_key_str, api_key, tier_hint, session_id)
+        except HTTPException as e:
+            return _batch_failure(session_id, results, index, e.status_code, e.detail, e.headers)
+        if isinstance(prepared, Response):
+            return _batch_failure(session_id, results, index, prepared.status_code, orjson.loads(prepared.body))
+        model_name, backend_url, body_bytes = prepared
+        result = await _forward_completion(
+            backend_url, turn, body_bytes, api_key_str, model_name,
+            session_id, start_time,
+        )
+        if isinstance(result, Response):
+            return _batch_failure(session_id, results, index, result.status_code, orjson.loads(result.body))
+        results.append(result)
+
+    return Response(content=orjson.dumps({
+        "session_id": session_id,
+        "results": results,
+        "message_count": _session_message_count(session_id),
+    }), media_type="application/json")
+
+
+def _batch_failure(
+    session_id: str, results: list[dict], index: int, status_code: int,
+    error: Any, headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """
+    The failing turn's error, under its own status code, alongside the
+    results of the turns that completed before it (their messages are
+    already in the session history).
+    """
+    if isinstance(error, dict) and "error" in error:
+        error = error["error"]
+    return Response(content=orjson.dumps({
+        "error": error,
+        "session_id": session_id,
+        "results": results,
+        "failed_index": index,
+        "message_count": _session_message_count(session_id),
+    }), status_code=status_code, headers=headers, media_type="application/json")
+
+
+def _session_message_count(session_id: str) -> int:
+    # The session can expire or be deleted while a batch is in flight
+    session = session_manager.get(session_id)
+    return session.message_count if session is not None else 0
+
+
+def _prepare_chat(
+    body: dict, api_key_str: str, api_key: APIKey, tier_hint: Optional[str], session_id: Optional[str],
+) -> Union[Response, tuple[str, str, bytes]]:
+    """
+    Resolve the model and backend for one chat request, splice in session
+    history and admit it against the TPM budget. Returns an error response,
+    or (model_name, backend_url, body_bytes).
+    """
     # Resolve model
     model_name = body.get("model")
     if not model_name:
@@ -111,12 +257,19 @@ async def chat_completions(request: Request):
         body["model"] = model_name
 
     # Model tiering: auto-route based on content if enabled
-    tier_hint = request.headers.get("x-gonka-tier")
     if tier_hint or not model_name:
+        messages = body.get("messages", [])
+        # Clients normally end with the new user turn; read it directly
+        # (before any session history is injected) instead of scanning
+        last = messages[-1] if messages else None
+        last_user_text = None
+        if isinstance(last, dict) and last.get("role") == "user" and isinstance(last.get("content"), str):
+            last_user_text = last["content"]
         tiered_model = model_tiering.resolve_model(
-            body.get("messages", []),
+            messages,
             requested_model=model_name,
             tier_hint=tier_hint,
+            last_user_text=last_user_text,
         )
         if tiered_model:
             model_name = tiered_model
@@ -125,41 +278,58 @@ async def chat_completions(request: Request):
     backend = model_router.resolve(model_name)
 
     # Agent session integration
-    session_id = request.headers.get("x-gonka-session-id")
     if session_id:
         session_manager.get_or_create(session_id, api_key_str)
         body["messages"] = session_manager.inject_history(session_id, body.get("messages", []))
 
-    # Forward to vLLM backend
-    is_streaming = body.get("stream", False)
+    # Serialize once: the same bytes size the TPM estimate and are sent upstream
+    body_bytes = orjson.dumps(body)
 
-    if is_streaming:
-        return await _stream_response(
-            backend.backend_url, body, api_key_str, model_name,
-            session_id, start_time,
-        )
-    else:
-        return await _forward_response(
-            backend.backend_url, body, api_key_str, model_name,
-            session_id, start_time,
-        )
+    # Reject up front if this prompt would exceed the key's TPM budget;
+    # ~4 bytes of JSON per token is close enough for admission control
+    rate_limiter.check_tokens(api_key_str, api_key.tpm_limit, estimated_tokens=len(body_bytes) // 4)
+
+    return model_name, backend.backend_url, body_bytes
 
 
 async def _forward_response(
-    backend_url: str, body: dict, api_key: str, model_name: str,
+    backend_url: str, body: dict, body_bytes: bytes, api_key: str, model_name: str,
     session_id: Optional[str], start_time: float,
-) -> JSONResponse:
+) -> Response:
     """Forward a non-streaming request to vLLM and return the response."""
+    result = await _forward_completion(
+        backend_url, body, body_bytes, api_key, model_name, session_id, start_time,
+    )
+    if isinstance(result, Response):
+        return result
+    return JSONResponse(content=result)
+
+
+async def _forward_completion(
+    backend_url: str, body: dict, body_bytes: bytes, api_key: str, model_name: str,
+    session_id: Optional[str], start_time: float,
+) -> Union[Response, dict]:
+    """Run one non-streaming completion: the decoded result, or an error response."""
+    bp = backpressure.get(backend_url)
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
+        async with bp.slot():
+            upstream_start = time.time()
             # Forward with vLLM's model ID
-            resp = await client.post(
+            resp = await http_client.post(
                 f"{backend_url}/v1/chat/completions",
-                json=body,
+                content=body_bytes,
+                headers=_JSON_HEADERS,
             )
-    except (httpx.ConnectError, httpx.TimeoutException):
+    except BackendUnavailable:
+        return backend_unavailable(model_name)
+    except httpx.TransportError:
+        bp.record_failure()
         return backend_unavailable(model_name)
 
+    _record_upstream(bp, resp.status_code, upstream_start)
+
+    rate_limiter.observe_headers(api_key, resp.headers)
+
     if resp.status_code != 200:
         return JSONResponse(status_code=resp.status_code, content=resp.json())
 
@@ -193,47 +363,48 @@ async def _forward_response(
                 new_messages.append(assistant_msg)
         session_manager.append_messages(session_id, new_messages)
 
-    return JSONResponse(content=result)
+    return result
 
 
 async def _stream_response(
-    backend_url: str, body: dict, api_key: str, model_name: str,
+    backend_url: str, body: dict, body_bytes: bytes, api_key: str, model_name: str,
     session_id: Optional[str], start_time: float,
 ):
     """Stream SSE response from vLLM backend through the gateway."""
     total_tokens = 0
 
+    bp = backpressure.get(backend_url)
+
     async def event_generator():
         nonlocal total_tokens
         try:
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                async with client.stream(
+            # The slot is held for the whole stream
+            async with bp.slot():
+                upstream_start = time.time()
+                async with http_client.stream(
                     "POST",
                     f"{backend_url}/v1/chat/completions",
-                    json=body,
+                    content=body_bytes,
+                    headers=_STREAM_HEADERS,
                 ) as resp:
+                    # Time to response headers, i.e. queueing + prefill
+                    _record_upstream(bp, resp.status_code, upstream_start)
+                    rate_limiter.observe_headers(api_key, resp.headers)
                     if resp.status_code != 200:
                         error_body = await resp.aread()
                         yield f"data: {error_body.decode()}\n\n"
                         return
 
-                    async for line in resp.aiter_lines():
-                        if line.startswith("data: "):
-                            data_str = line[6:]
-                            if data_str.strip() == "[DONE]":
-                                yield f"data: [DONE]\n\n"
-                                break
-
-                            try:
-                                chunk = json.loads(data_str)
-                                usage = chunk.get("usage")
-                                if usage:
-                                    total_tokens = usage.get("total_tokens", 0)
-                            except json.JSONDecodeError:
-                                pass
-
-                            yield f"{line}\n\n"
-        except (httpx.ConnectError, httpx.TimeoutException):
+                    # Pass the SSE bytes through untouched. vLLM only reports
+                    # usage in the final chunk, so keep just the tail to find it.
+                    tail = b""
+                    async for chunk in resp.aiter_raw(65536):
+                        yield chunk
+                        tail = (tail + chunk)[-_SSE_TAIL_BYTES:]
+                    total_tokens = _stream_total_tokens(tail)
+        except (httpx.TransportError, BackendUnavailable) as e:
+            if not isinstance(e, BackendUnavailable):
+                bp.record_failure()
             error_data = {
                 "error": {
                     "message": f"Backend '{model_name}' unavailable",
@@ -268,6 +439,27 @@ async def _stream_response(
     )
 
 
+def _record_upstream(bp: Backpressure, status_code: int, start: float):
+    """Feed an upstream response into the backend's AIMD limit."""
+    if status_code == 429 or status_code >= 500:
+        bp.record_failure()
+    else:
+        bp.record_success((time.time() - start) * 1000)
+
+
+def _stream_total_tokens(tail: bytes) -> int:
+    """total_tokens from the last SSE event in `tail` that carries usage."""
+    for line in reversed(tail.splitlines()):
+        if line.startswith(b"data: ") and b'"usage"' in line:
+            try:
+                usage = orjson.loads(line[6:]).get("usage")
+            except (orjson.JSONDecodeError, AttributeError):
+                continue
+            if usage:
+                return usage.get("total_tokens", 0)
+    return 0
+
+
 # ---------- Health ----------
 
 
@@ -286,6 +478,12 @@ async def health():
 @app.on_event("startup")
 async def startup():
     """Bootstrap dev environment and start background tasks."""
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=300.0,
+        limits=httpx.Limits(max_connections=1024, max_keepalive_connections=256),
+    )
+
     if auth_manager.key_count == 0:
         dev_key = "gk-dev-" + "0" * 48
         auth_manager.add_key(
@@ -297,14 +495,38 @@ async def startup():
         )
         print(f"  Dev API key created: {dev_key}")
 
-    # Start periodic session cleanup
+    # Start background session expiry, rate-limit GC, usage writes, API key
+    # persistence and webhook delivery
     asyncio.create_task(_session_cleanup_loop())
+    asyncio.create_task(rate_limiter.run_gc())
+    asyncio.create_task(usage_meter.run())
+    asyncio.create_task(auth_manager.flush_periodically())
+    asyncio.create_task(webhook_manager.run())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Persist pending usage and key changes, close pooled upstream connections."""
+    usage_meter.flush()
+    await auth_manager.flush()
+    if http_client is not None:
+        await http_client.aclose()
+    await webhook_manager.aclose()
+    await health_checker.aclose()
 
 
 async def _session_cleanup_loop():
-    """Periodically clean up expired sessions."""
+    """
+    Reap expired sessions as soon as the least recently used one expires.
+
+    Shards are kept in LRU order, so the front of each shard already acts
+    as the expiry heap. The TTL is fixed, so a new or touched session can
+    only expire later than the current front and never needs to wake this
+    loop early.
+    """
     while True:
-        await asyncio.sleep(300)  # Every 5 minutes
+        # Floor of 1s so a burst of expiries doesn't spin the loop
+        await asyncio.sleep(max(1.0, session_manager.seconds_until_next_expiry()))
         removed = session_manager.cleanup_expired()
         if removed > 0:
             print(f"  Cleaned up {removed} expired sessions")
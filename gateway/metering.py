@@ -3,17 +3,82 @@ Usage Metering for Gonka.ai gateway.
 
 Tracks token consumption per API key, per model, per time period.
 Stores data in SQLite for persistence across restarts.
+
+Raw events are kept in `usage`; `usage_rollup_1m` and `usage_rollup_1h`
+hold per-minute and per-hour aggregates maintained on every write, so
+admin queries read one row per (hour, key, model) for most of a window
+and fall back to minutes and raw events only at its leading edge.
+
+record() only buffers the event. A background task (run()) writes
+buffered events in batches, one transaction per FLUSH_MAX_RECORDS or
+FLUSH_INTERVAL_SECONDS, on a dedicated connection in a worker thread.
+The buffer is bounded by MAX_PENDING_RECORDS: if writes stall, record()
+drops new events and counts them in dropped_records rather than growing
+without limit. Queries flush the buffer first, so they always see every
+recorded event, and whatever is still buffered at interpreter exit is
+written by an atexit hook, so a process that never runs the shutdown
+handler doesn't lose it.
 """
 
+import asyncio
+import atexit
+import os
+import queue
 import sqlite3
+import threading
 import time
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
+# Width of a rollup bucket in seconds
+BUCKET_SECONDS = 60
+HOUR_BUCKET_SECONDS = 3600
+
+# Write-behind batching
+FLUSH_MAX_RECORDS = 512
+FLUSH_INTERVAL_SECONDS = 0.2
+# Events buffered beyond this (writes stalled) are dropped and counted
+MAX_PENDING_RECORDS = 100_000
+
+# Pooled read-only connections for the get_* queries
+READ_POOL_SIZE = min(16, 2 * (os.cpu_count() or 1))
+
+# WAL lets queries read while a batch is being written; with WAL,
+# synchronous=NORMAL only fsyncs at checkpoints
+_WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+_INSERT_USAGE_SQL = """
+    INSERT INTO usage
+    (api_key, model, input_tokens, output_tokens, total_tokens,
+     latency_ms, session_id, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_ROLLUP_SQL = """
+    INSERT INTO {table}
+    (bucket_ts, api_key, model, request_count, input_tokens,
+     output_tokens, total_tokens, latency_ms_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket_ts, api_key, model) DO UPDATE SET
+      request_count = request_count + excluded.request_count,
+      input_tokens = input_tokens + excluded.input_tokens,
+      output_tokens = output_tokens + excluded.output_tokens,
+      total_tokens = total_tokens + excluded.total_tokens,
+      latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum
+"""
+_UPSERT_ROLLUP_1M_SQL = _UPSERT_ROLLUP_SQL.format(table="usage_rollup_1m")
+_UPSERT_ROLLUP_1H_SQL = _UPSERT_ROLLUP_SQL.format(table="usage_rollup_1h")
+
 
-@dataclass
+@dataclass(slots=True)
 class UsageRecord:
     api_key: str
     model: str
@@ -31,10 +96,33 @@ class UsageMeter:
     def __init__(self, db_path: str = "data/usage.db"):
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._db_path = db_path
+        # Rows in _INSERT_USAGE_SQL parameter order
+        self._pending: list[tuple] = []
+        # Guards _pending: record() appends on the event loop while flush()
+        # swaps it out from a worker thread. Held only for the append/swap.
+        self._pending_lock = threading.Lock()
+        self.dropped_records = 0
+        self._wakeup = asyncio.Event()
+        # Serializes batch writes on the writer connection
+        self._write_lock = threading.Lock()
+        # One long-lived writer connection; only used under _write_lock,
+        # from whichever thread holds it
+        self._writer = sqlite3.connect(db_path, check_same_thread=False)
+        for pragma in _WRITER_PRAGMAS:
+            self._writer.execute(pragma)
         self._init_db()
+        # Read-only connections for queries, so they neither reconnect per
+        # call nor queue behind the writer
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(READ_POOL_SIZE):
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only=true")
+            self._readers.put(conn)
+        atexit.register(self.flush)
 
     def _init_db(self):
-        with self._conn() as conn:
+        with self._write_lock, self._writer as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS usage (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -48,80 +136,209 @@ class UsageMeter:
                     timestamp REAL NOT NULL
                 )
             """)
+            # Covering indexes: every column the queries read is in the
+            # index, so aggregates never visit the table rows
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_usage_key_cover
+                ON usage (api_key, timestamp, model, input_tokens,
+                          output_tokens, total_tokens, latency_ms)
+            """)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_usage_key_time
-                ON usage (api_key, timestamp)
+                CREATE INDEX IF NOT EXISTS idx_usage_model_cover
+                ON usage (model, timestamp, api_key, input_tokens,
+                          output_tokens, total_tokens, latency_ms)
             """)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_usage_model_time
-                ON usage (model, timestamp)
+                CREATE INDEX IF NOT EXISTS idx_usage_time_cover
+                ON usage (timestamp, api_key, model, input_tokens,
+                          output_tokens, total_tokens, latency_ms)
             """)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_usage_session
-                ON usage (session_id)
+                CREATE INDEX IF NOT EXISTS idx_usage_session_cover
+                ON usage (session_id, input_tokens, output_tokens,
+                          total_tokens, latency_ms, timestamp)
             """)
+            # Superseded by the covering indexes above
+            conn.execute("DROP INDEX IF EXISTS idx_usage_key_time")
+            conn.execute("DROP INDEX IF EXISTS idx_usage_model_time")
+            conn.execute("DROP INDEX IF EXISTS idx_usage_session")
+
+            rollup_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage_rollup_1m'"
+            ).fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage_rollup_1m (
+                    bucket_ts INTEGER NOT NULL,
+                    api_key TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    request_count INTEGER NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    total_tokens INTEGER NOT NULL,
+                    latency_ms_sum REAL NOT NULL,
+                    PRIMARY KEY (bucket_ts, api_key, model)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_rollup_key_time
+                ON usage_rollup_1m (api_key, bucket_ts)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_rollup_model_time
+                ON usage_rollup_1m (model, bucket_ts)
+            """)
+            if not rollup_exists:
+                # Aggregate events recorded before rollups existed
+                conn.execute(
+                    """INSERT INTO usage_rollup_1m
+                       SELECT CAST(timestamp / ? AS INTEGER) * ?, api_key, model,
+                              COUNT(*), SUM(input_tokens), SUM(output_tokens),
+                              SUM(total_tokens), SUM(latency_ms)
+                       FROM usage GROUP BY 1, 2, 3""",
+                    (BUCKET_SECONDS, BUCKET_SECONDS),
+                )
+
+            hourly_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage_rollup_1h'"
+            ).fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage_rollup_1h (
+                    bucket_ts INTEGER NOT NULL,
+                    api_key TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    request_count INTEGER NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    total_tokens INTEGER NOT NULL,
+                    latency_ms_sum REAL NOT NULL,
+                    PRIMARY KEY (bucket_ts, api_key, model)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_rollup_1h_key_time
+                ON usage_rollup_1h (api_key, bucket_ts)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_rollup_1h_model_time
+                ON usage_rollup_1h (model, bucket_ts)
+            """)
+            if not hourly_exists:
+                # The minute rollup is complete by now; fold it into hours
+                conn.execute(
+                    """INSERT INTO usage_rollup_1h
+                       SELECT (bucket_ts / ?) * ?, api_key, model,
+                              SUM(request_count), SUM(input_tokens), SUM(output_tokens),
+                              SUM(total_tokens), SUM(latency_ms_sum)
+                       FROM usage_rollup_1m GROUP BY 1, 2, 3""",
+                    (HOUR_BUCKET_SECONDS, HOUR_BUCKET_SECONDS),
+                )
+
+        with self._write_lock:
+            # Fold any WAL left by the previous run back into the database
+            # and refresh planner statistics for the indexes
+            self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._writer.execute("PRAGMA optimize")
 
     @contextmanager
-    def _conn(self):
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
+    def _read_conn(self):
+        # Blocks if every reader is checked out
+        conn = self._readers.get()
         try:
             yield conn
-            conn.commit()
         finally:
-            conn.close()
+            self._readers.put(conn)
 
     def record(self, record: UsageRecord):
-        """Record a usage event."""
-        with self._conn() as conn:
-            conn.execute(
-                """INSERT INTO usage
-                   (api_key, model, input_tokens, output_tokens, total_tokens,
-                    latency_ms, session_id, timestamp)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    record.api_key,
-                    record.model,
-                    record.input_tokens,
-                    record.output_tokens,
-                    record.total_tokens,
-                    record.latency_ms,
-                    record.session_id,
-                    record.timestamp,
-                ),
-            )
+        """Record a usage event (buffered; written by the background task)."""
+        row = (
+            record.api_key, record.model, record.input_tokens, record.output_tokens,
+            record.total_tokens, record.latency_ms, record.session_id, record.timestamp,
+        )
+        with self._pending_lock:
+            if len(self._pending) >= MAX_PENDING_RECORDS:
+                self.dropped_records += 1
+                return
+            self._pending.append(row)
+            pending = len(self._pending)
+        if pending >= FLUSH_MAX_RECORDS:
+            self._wakeup.set()
+
+    async def run(self):
+        """Background task: write buffered events in batches."""
+        reported_drops = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except sqlite3.Error as e:
+                    print(f"  Failed to write usage events: {e}")
+            if self.dropped_records != reported_drops:
+                print(f"  Usage buffer full: dropped {self.dropped_records - reported_drops} events")
+                reported_drops = self.dropped_records
+
+    def flush(self):
+        """Write all buffered events now, in one transaction."""
+        with self._write_lock:
+            # record() appends under _pending_lock too, so every event ends
+            # up in either this batch or the fresh buffer
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                with self._writer as conn:
+                    conn.executemany(_INSERT_USAGE_SQL, batch)
+                    conn.executemany(_UPSERT_ROLLUP_1M_SQL, _rollup(batch, BUCKET_SECONDS))
+                    conn.executemany(_UPSERT_ROLLUP_1H_SQL, _rollup(batch, HOUR_BUCKET_SECONDS))
+            except sqlite3.Error:
+                # Rolled back; keep the events for the next attempt
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                raise
 
     def get_usage_by_key(self, api_key: str, since: float = 0) -> dict:
         """Get aggregated usage for an API key since timestamp."""
-        with self._conn() as conn:
+        self.flush()
+        edges = _window_edges(since)
+        with self._read_conn() as conn:
             row = conn.execute(
-                """SELECT
-                     COUNT(*) as request_count,
+                f"""WITH window AS ({_WINDOW_SQL.format(where="api_key = ?")})
+                   SELECT
+                     COALESCE(SUM(request_count), 0) as request_count,
                      COALESCE(SUM(input_tokens), 0) as total_input,
                      COALESCE(SUM(output_tokens), 0) as total_output,
                      COALESCE(SUM(total_tokens), 0) as total_tokens,
-                     COALESCE(AVG(latency_ms), 0) as avg_latency_ms
-                   FROM usage WHERE api_key = ? AND timestamp > ?""",
-                (api_key, since),
+                     COALESCE(SUM(latency_ms_sum) / SUM(request_count), 0) as avg_latency_ms
+                   FROM window""",
+                (api_key, edges[1], api_key, *edges, api_key, since, edges[0]),
             ).fetchone()
             return dict(row)
 
     def get_usage_by_model(self, model: str, since: float = 0) -> dict:
         """Get aggregated usage for a model since timestamp."""
-        with self._conn() as conn:
+        self.flush()
+        edges = _window_edges(since)
+        with self._read_conn() as conn:
             row = conn.execute(
-                """SELECT
-                     COUNT(*) as request_count,
+                f"""WITH window AS ({_WINDOW_SQL.format(where="model = ?")})
+                   SELECT
+                     COALESCE(SUM(request_count), 0) as request_count,
                      COALESCE(SUM(total_tokens), 0) as total_tokens,
-                     COALESCE(AVG(latency_ms), 0) as avg_latency_ms
-                   FROM usage WHERE model = ? AND timestamp > ?""",
-                (model, since),
+                     COALESCE(SUM(latency_ms_sum) / SUM(request_count), 0) as avg_latency_ms
+                   FROM window""",
+                (model, edges[1], model, *edges, model, since, edges[0]),
             ).fetchone()
             return dict(row)
 
     def get_usage_by_session(self, session_id: str) -> dict:
         """Get aggregated usage for a session."""
-        with self._conn() as conn:
+        self.flush()
+        with self._read_conn() as conn:
             row = conn.execute(
                 """SELECT
                      COUNT(*) as request_count,
@@ -138,33 +355,88 @@ class UsageMeter:
 
     def get_usage_breakdown(self, api_key: str, since: float = 0) -> list[dict]:
         """Get per-model usage breakdown for an API key."""
-        with self._conn() as conn:
+        self.flush()
+        edges = _window_edges(since)
+        with self._read_conn() as conn:
             rows = conn.execute(
-                """SELECT
+                f"""WITH window AS ({_WINDOW_SQL.format(where="api_key = ?")})
+                   SELECT
                      model,
-                     COUNT(*) as request_count,
+                     SUM(request_count) as request_count,
                      SUM(input_tokens) as total_input,
                      SUM(output_tokens) as total_output,
                      SUM(total_tokens) as total_tokens,
-                     AVG(latency_ms) as avg_latency_ms
-                   FROM usage
-                   WHERE api_key = ? AND timestamp > ?
+                     SUM(latency_ms_sum) / SUM(request_count) as avg_latency_ms
+                   FROM window
                    GROUP BY model""",
-                (api_key, since),
+                (api_key, edges[1], api_key, *edges, api_key, since, edges[0]),
             ).fetchall()
             return [dict(r) for r in rows]
 
     def get_global_stats(self, since: float = 0) -> dict:
         """Get global usage statistics."""
-        with self._conn() as conn:
+        self.flush()
+        edges = _window_edges(since)
+        with self._read_conn() as conn:
             row = conn.execute(
-                """SELECT
-                     COUNT(*) as total_requests,
+                f"""WITH window AS ({_WINDOW_SQL.format(where="1")})
+                   SELECT
+                     COALESCE(SUM(request_count), 0) as total_requests,
                      COUNT(DISTINCT api_key) as active_keys,
                      COUNT(DISTINCT model) as active_models,
                      COALESCE(SUM(total_tokens), 0) as total_tokens,
-                     COALESCE(AVG(latency_ms), 0) as avg_latency_ms
-                   FROM usage WHERE timestamp > ?""",
-                (since,),
+                     COALESCE(SUM(latency_ms_sum) / SUM(request_count), 0) as avg_latency_ms
+                   FROM window""",
+                (edges[1], *edges, since, edges[0]),
             ).fetchone()
             return dict(row)
+
+
+# Window aggregates read whole hour buckets from the first hour boundary
+# after `since`, minute buckets between the first minute boundary and that
+# hour, plus the raw events in the partial minute before it, so results
+# match a scan of the raw table exactly.
+# Parameters: (*where, hour_edge, *where, minute_edge, hour_edge,
+#              *where, since, minute_edge)
+_WINDOW_SQL = """
+    SELECT api_key, model, request_count, input_tokens, output_tokens,
+           total_tokens, latency_ms_sum
+    FROM usage_rollup_1h WHERE {where} AND bucket_ts >= ?
+    UNION ALL
+    SELECT api_key, model, request_count, input_tokens, output_tokens,
+           total_tokens, latency_ms_sum
+    FROM usage_rollup_1m WHERE {where} AND bucket_ts >= ? AND bucket_ts < ?
+    UNION ALL
+    SELECT api_key, model, 1, input_tokens, output_tokens,
+           total_tokens, latency_ms
+    FROM usage WHERE {where} AND timestamp > ? AND timestamp < ?
+"""
+
+
+def _bucket(timestamp: float, width: int = BUCKET_SECONDS) -> int:
+    """Start of the rollup bucket containing timestamp."""
+    return int(timestamp // width) * width
+
+
+def _window_edges(since: float) -> tuple[int, int]:
+    """First minute boundary strictly after since, and the first hour boundary at or after it."""
+    minute_edge = _bucket(since) + BUCKET_SECONDS
+    hour_edge = -(-minute_edge // HOUR_BUCKET_SECONDS) * HOUR_BUCKET_SECONDS
+    return minute_edge, hour_edge
+
+
+def _rollup(batch: list[tuple], width: int) -> list[tuple]:
+    """Sum a batch of usage rows into one upsert row per (bucket, key, model)."""
+    totals: dict[tuple, list] = {}
+    for key, model, inp, out, total, latency, _, ts in batch:
+        group = (_bucket(ts, width), key, model)
+        acc = totals.get(group)
+        if acc is None:
+            totals[group] = [1, inp, out, total, latency]
+        else:
+            acc[0] += 1
+            acc[1] += inp
+            acc[2] += out
+            acc[3] += total
+            acc[4] += latency
+    return [(*group, *acc) for group, acc in totals.items()]
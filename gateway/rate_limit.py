@@ -5,52 +5,96 @@ Implements sliding-window rate limiting per API key:
 - Requests per minute (RPM)
 - Tokens per minute (TPM)
 
-Uses in-memory tracking with automatic window expiry.
+Uses in-memory tracking with automatic window expiry. A background sweep
+(run_gc) drops counters for keys that have gone idle, so one-shot keys
+don't accumulate.
+
+Also reacts to upstream x-ratelimit-* response headers: when a backend
+reports it is nearly out of request capacity, the key's effective RPM is
+cut until the backend's reset time, so clients back off before vLLM
+starts rejecting.
 """
 
+import asyncio
+import re
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
+from typing import Optional
 
 from fastapi import HTTPException
 
+# Upstream remaining/limit ratio at or below which we start throttling
+UPSTREAM_LOW_WATERMARK = 0.1
+# Effective RPM multiplier while throttled
+UPSTREAM_THROTTLE_FACTOR = 0.5
+
+# Reset durations look like "1s", "6m0s", "20ms"
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Seconds between sweeps of idle counters
+GC_INTERVAL_SECONDS = 5.0
+
 
 @dataclass
 class WindowCounter:
-    """Sliding window counter for rate limiting."""
-    timestamps: list[float] = field(default_factory=list)
-    token_counts: list[tuple[float, int]] = field(default_factory=list)
+    """Sliding window counter for rate limiting.
+
+    Entries are appended in time order, so expiry pops from the front.
+    """
+    timestamps: deque[float] = field(default_factory=deque)
+    token_counts: deque[tuple[float, int]] = field(default_factory=deque)
+    # Sum of the counts in token_counts, kept in step with it
+    token_sum: int = 0
 
     def add_request(self, timestamp: float):
         self.timestamps.append(timestamp)
 
     def add_tokens(self, timestamp: float, count: int):
         self.token_counts.append((timestamp, count))
+        self.token_sum += count
 
-    def request_count(self, window_seconds: float = 60.0) -> int:
-        cutoff = time.time() - window_seconds
-        self.timestamps = [t for t in self.timestamps if t > cutoff]
-        return len(self.timestamps)
+    def request_count(self, window_seconds: float = 60.0, now: Optional[float] = None) -> int:
+        cutoff = (time.time() if now is None else now) - window_seconds
+        timestamps = self.timestamps
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
+        return len(timestamps)
 
-    def token_count(self, window_seconds: float = 60.0) -> int:
-        cutoff = time.time() - window_seconds
-        self.token_counts = [(t, c) for t, c in self.token_counts if t > cutoff]
-        return sum(c for _, c in self.token_counts)
+    def token_count(self, window_seconds: float = 60.0, now: Optional[float] = None) -> int:
+        cutoff = (time.time() if now is None else now) - window_seconds
+        token_counts = self.token_counts
+        while token_counts and token_counts[0][0] <= cutoff:
+            self.token_sum -= token_counts.popleft()[1]
+        return self.token_sum
 
 
 class RateLimiter:
     """Per-key rate limiting with configurable RPM and TPM limits."""
 
     def __init__(self):
+        # Only check_request/record_tokens create entries
         self._counters: dict[str, WindowCounter] = defaultdict(WindowCounter)
+        # api_key -> time until which the RPM limit is reduced
+        self._throttled_until: dict[str, float] = {}
 
     def check_request(self, api_key: str, rpm_limit: int):
         """Check if request is within rate limits. Raises 429 if exceeded."""
+        # One clock read: the window cutoff and the new entry's stamp agree
+        now = time.time()
         counter = self._counters[api_key]
-        current_rpm = counter.request_count()
+        current_rpm = counter.request_count(now=now)
+
+        throttled_until = self._throttled_until.get(api_key)
+        if throttled_until is not None:
+            if throttled_until > now:
+                rpm_limit = max(1, int(rpm_limit * UPSTREAM_THROTTLE_FACTOR))
+            else:
+                del self._throttled_until[api_key]
 
         if current_rpm >= rpm_limit:
-            retry_after = self._estimate_retry_after(counter)
+            retry_after = self._estimate_retry_after(counter, now)
             raise HTTPException(
                 status_code=429,
                 detail={
@@ -63,18 +107,25 @@ class RateLimiter:
                 headers={"Retry-After": str(retry_after)},
             )
 
-        counter.add_request(time.time())
+        counter.add_request(now)
 
     def record_tokens(self, api_key: str, token_count: int):
         """Record token usage for TPM tracking."""
         self._counters[api_key].add_tokens(time.time(), token_count)
 
-    def check_tokens(self, api_key: str, tpm_limit: int):
-        """Check if token usage is within limits."""
-        counter = self._counters[api_key]
-        current_tpm = counter.token_count()
+    def check_tokens(self, api_key: str, tpm_limit: int, estimated_tokens: int = 0):
+        """
+        Check if token usage is within limits.
 
-        if current_tpm >= tpm_limit:
+        estimated_tokens is the expected cost of the request about to be
+        sent; it is rejected up front if it would push the key over its
+        TPM limit (a lone request on an idle key is always let through).
+        """
+        # Reads use .get() so unknown keys don't get a counter
+        counter = self._counters.get(api_key)
+        current_tpm = counter.token_count() if counter is not None else 0
+
+        if current_tpm >= tpm_limit or (current_tpm and current_tpm + estimated_tokens > tpm_limit):
             raise HTTPException(
                 status_code=429,
                 detail={
@@ -86,18 +137,64 @@ class RateLimiter:
                 },
             )
 
+    def observe_headers(self, api_key: str, headers) -> None:
+        """Throttle the key if the backend reports it is nearly saturated."""
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        limit = headers.get("x-ratelimit-limit-requests")
+        if remaining is None or limit is None:
+            return
+        try:
+            remaining, limit = int(remaining), int(limit)
+        except ValueError:
+            return
+        if limit > 0 and remaining <= limit * UPSTREAM_LOW_WATERMARK:
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests", "")) or 60.0
+            self._throttled_until[api_key] = time.time() + reset
+
+    def sweep(self):
+        """Drop counters with nothing left in the window, and lapsed throttles."""
+        now = time.time()
+        idle = [
+            api_key for api_key, counter in self._counters.items()
+            if not counter.request_count(now=now) and not counter.token_count(now=now)
+        ]
+        for api_key in idle:
+            del self._counters[api_key]
+        for api_key, until in list(self._throttled_until.items()):
+            if until <= now:
+                del self._throttled_until[api_key]
+
+    async def run_gc(self, interval: float = GC_INTERVAL_SECONDS):
+        """Background task: sweep idle counters periodically."""
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
     def get_usage(self, api_key: str) -> dict:
         """Get current usage stats for a key."""
-        counter = self._counters[api_key]
+        counter = self._counters.get(api_key)
+        if counter is None:
+            return {"rpm_current": 0, "tpm_current": 0}
+        now = time.time()
         return {
-            "rpm_current": counter.request_count(),
-            "tpm_current": counter.token_count(),
+            "rpm_current": counter.request_count(now=now),
+            "tpm_current": counter.token_count(now=now),
         }
 
-    def _estimate_retry_after(self, counter: WindowCounter) -> int:
+    def _estimate_retry_after(self, counter: WindowCounter, now: float) -> int:
         """Estimate seconds until the oldest request in the window expires."""
         if not counter.timestamps:
             return 1
-        oldest = min(counter.timestamps)
-        wait = 60.0 - (time.time() - oldest)
+        # Appended in time order, so the front is the oldest
+        oldest = counter.timestamps[0]
+        wait = 60.0 - (now - oldest)
         return max(1, int(wait) + 1)
+
+
+def _parse_duration(value: str) -> float:
+    """Parse an x-ratelimit-reset-* duration into seconds (0 if unparseable)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in _DURATION_RE.findall(value))
@@ -3,8 +3,14 @@ Model Router for Gonka.ai gateway.
 
 Routes incoming requests to the correct vLLM backend based on the
 model parameter in the request body. Reads model registry from models.yaml.
+
+reload() is a no-op while the file's mtime and size are unchanged, and the
+/v1/models listing is built once per load rather than on every call.
 """
 
+import sys
+
+import orjson
 import yaml
 from dataclasses import dataclass
 from pathlib import Path
@@ -12,6 +18,9 @@ from typing import Optional
 
 from fastapi import HTTPException
 
+# libyaml's C loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 @dataclass
 class ModelBackend:
@@ -31,20 +40,34 @@ class ModelRouter:
 
     def __init__(self, config_path: str = "infrastructure/config/models.yaml"):
         self._backends: dict[str, ModelBackend] = {}
+        self._models_list: list[dict] = []
+        # Encoded /v1/models response body, rebuilt with _models_list
+        self.models_json = b'{"object":"list","data":[]}'
         self._config_path = config_path
+        # (mtime_ns, size) of the file as last loaded
+        self._loaded_stat: Optional[tuple[int, int]] = None
+        # Incremented on every reload so callers can tell when the registry changed
+        self.config_version = 0
         self.reload()
 
     def reload(self):
         """Reload model configuration from YAML."""
         path = Path(self._config_path)
-        if not path.exists():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return
+        if (st.st_mtime_ns, st.st_size) == self._loaded_stat:
             return
 
         with open(path) as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_YAML_LOADER)
 
         self._backends.clear()
         for name, model_config in config.get("models", {}).items():
+            # Interned (as are the tiering targets), so resolving a tiered
+            # model name short-circuits on identity
+            name = sys.intern(name)
             self._backends[name] = ModelBackend(
                 name=name,
                 display_name=model_config.get("display_name", name),
@@ -56,27 +79,7 @@ class ModelRouter:
                 context_length=model_config.get("context_length", 4096),
                 pricing=model_config.get("pricing", {}),
             )
-
-    def resolve(self, model_name: str) -> ModelBackend:
-        """Resolve a model name to its backend configuration."""
-        backend = self._backends.get(model_name)
-        if not backend:
-            available = list(self._backends.keys())
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "error": {
-                        "message": f"Model '{model_name}' not found. Available: {available}",
-                        "type": "invalid_request_error",
-                        "code": "model_not_found",
-                    }
-                },
-            )
-        return backend
-
-    def list_models(self) -> list[dict]:
-        """List available models in OpenAI /v1/models format."""
-        return [
+        self._models_list = [
             {
                 "id": name,
                 "object": "model",
@@ -88,6 +91,30 @@ class ModelRouter:
             }
             for name, backend in self._backends.items()
         ]
+        self.models_json = orjson.dumps({"object": "list", "data": self._models_list})
+        self._loaded_stat = (st.st_mtime_ns, st.st_size)
+        self.config_version += 1
+
+    def resolve(self, model_name: str) -> ModelBackend:
+        """Resolve a model name to its backend configuration."""
+        backend = self._backends.get(model_name)
+        if backend is not None:
+            return backend
+        available = list(self._backends)
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": {
+                    "message": f"Model '{model_name}' not found. Available: {available}",
+                    "type": "invalid_request_error",
+                    "code": "model_not_found",
+                }
+            },
+        )
+
+    def list_models(self) -> list[dict]:
+        """List available models in OpenAI /v1/models format (shared; don't mutate)."""
+        return self._models_list
 
     def get_default_model(self) -> Optional[str]:
         """Get the default model name (first registered)."""
@@ -3,6 +3,10 @@ Gonka.ai Health Check — monitors vLLM backend status, GPU utilization, and que
 
 Provides /health endpoint data for the gateway and external monitoring.
 Can be used standalone or imported by the gateway.
+
+GPU stats come from NVML (pynvml, from nvidia-ml-py) when it is installed,
+and from nvidia-smi otherwise. Either way they are cached for
+GPU_INFO_TTL_SECONDS, since pollers ask more often than the numbers move.
 """
 
 import asyncio
@@ -12,8 +16,13 @@ from typing import Optional
 
 import httpx
 
+# How long a GPU reading is reused
+GPU_INFO_TTL_SECONDS = 0.5
+
+_QUEUE_METRICS = frozenset({"vllm:num_requests_waiting", "vllm:num_requests_running"})
 
-@dataclass
+
+@dataclass(slots=True)
 class GPUInfo:
     index: int
     name: str
@@ -28,7 +37,7 @@ class GPUInfo:
         return (self.memory_used_mb / self.memory_total_mb) * 100
 
 
-@dataclass
+@dataclass(slots=True)
 class ModelStatus:
     model_name: str
     status: str  # "ready", "loading", "error", "unreachable"
@@ -68,30 +77,72 @@ class HealthChecker:
     def __init__(self, vllm_base_url: str = "http://localhost:8000"):
         self.vllm_base_url = vllm_base_url.rstrip("/")
         self._start_time = time.time()
+        self._gpu_cache: list[GPUInfo] = []
+        self._gpu_cached_at = 0.0
+        self._nvml = _init_nvml()
+        # One keep-alive client for every probe
+        self._client = httpx.AsyncClient(
+            base_url=self.vllm_base_url,
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=10),
+        )
+
+    async def aclose(self):
+        """Close pooled connections (call on shutdown)."""
+        await self._client.aclose()
 
     async def check_vllm_health(self) -> bool:
         """Check if vLLM is responding."""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(f"{self.vllm_base_url}/health")
-                return resp.status_code == 200
+            resp = await self._client.get("/health")
+            return resp.status_code == 200
         except (httpx.ConnectError, httpx.TimeoutException):
             return False
 
     async def get_vllm_models(self) -> list[str]:
         """Get list of models served by vLLM."""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(f"{self.vllm_base_url}/v1/models")
-                if resp.status_code == 200:
-                    data = resp.json()
-                    return [m["id"] for m in data.get("data", [])]
+            resp = await self._client.get("/v1/models")
+            if resp.status_code == 200:
+                data = resp.json()
+                return [m["id"] for m in data.get("data", [])]
         except (httpx.ConnectError, httpx.TimeoutException):
             pass
         return []
 
     def get_gpu_info(self) -> list[GPUInfo]:
-        """Get GPU utilization via nvidia-smi (if available)."""
+        """Get GPU utilization via NVML or nvidia-smi (if available)."""
+        now = time.time()
+        if now - self._gpu_cached_at < GPU_INFO_TTL_SECONDS:
+            return self._gpu_cache
+        if self._nvml is not None:
+            gpus = self._gpu_info_nvml()
+        else:
+            gpus = self._gpu_info_smi()
+        self._gpu_cache, self._gpu_cached_at = gpus, now
+        return gpus
+
+    def _gpu_info_nvml(self) -> list[GPUInfo]:
+        nvml = self._nvml
+        try:
+            gpus = []
+            for i in range(nvml.nvmlDeviceGetCount()):
+                handle = nvml.nvmlDeviceGetHandleByIndex(i)
+                name = nvml.nvmlDeviceGetName(handle)
+                memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+                utilization = nvml.nvmlDeviceGetUtilizationRates(handle)
+                gpus.append(GPUInfo(
+                    index=i,
+                    name=name.decode() if isinstance(name, bytes) else name,
+                    memory_used_mb=memory.used / (1024 * 1024),
+                    memory_total_mb=memory.total / (1024 * 1024),
+                    utilization_percent=float(utilization.gpu),
+                ))
+            return gpus
+        except nvml.NVMLError:
+            return []
+
+    def _gpu_info_smi(self) -> list[GPUInfo]:
         try:
             import subprocess
             result = subprocess.run(
@@ -126,7 +177,12 @@ class HealthChecker:
 
     async def get_status(self, model_name: str = "moonshotai/Kimi-K2.5") -> ModelStatus:
         """Get comprehensive health status."""
-        is_healthy = await self.check_vllm_health()
+        # Independent probes: run them together, GPU reads in a thread
+        is_healthy, models, gpu_info = await asyncio.gather(
+            self.check_vllm_health(),
+            self.get_vllm_models(),
+            asyncio.to_thread(self.get_gpu_info),
+        )
 
         if not is_healthy:
             return ModelStatus(
@@ -135,9 +191,6 @@ class HealthChecker:
                 error="vLLM backend not responding",
             )
 
-        models = await self.get_vllm_models()
-        gpu_info = self.get_gpu_info()
-
         return ModelStatus(
             model_name=model_name,
             status="ready" if models else "loading",
@@ -148,26 +201,52 @@ class HealthChecker:
     async def get_queue_depth(self) -> dict:
         """Get pending/active request counts from vLLM metrics."""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.get(f"{self.vllm_base_url}/metrics")
-                if resp.status_code == 200:
-                    metrics_text = resp.text
-                    pending = _parse_metric(metrics_text, "vllm:num_requests_waiting")
-                    running = _parse_metric(metrics_text, "vllm:num_requests_running")
-                    return {"pending": pending, "active": running}
+            resp = await self._client.get("/metrics")
+            if resp.status_code == 200:
+                values = _parse_metrics(resp.text, _QUEUE_METRICS)
+                return {
+                    "pending": values.get("vllm:num_requests_waiting", 0),
+                    "active": values.get("vllm:num_requests_running", 0),
+                }
         except (httpx.ConnectError, httpx.TimeoutException):
             pass
         return {"pending": 0, "active": 0}
 
 
-def _parse_metric(metrics_text: str, metric_name: str) -> int:
-    """Parse a single metric value from Prometheus-format metrics."""
-    for line in metrics_text.split("\n"):
-        if line.startswith(metric_name) and not line.startswith("#"):
-            parts = line.split()
-            if len(parts) >= 2:
-                try:
-                    return int(float(parts[-1]))
-                except ValueError:
-                    pass
-    return 0
+def _init_nvml():
+    """The pynvml module, initialized, or None if NVML isn't usable here."""
+    try:
+        import pynvml
+    except ImportError:
+        return None
+    try:
+        pynvml.nvmlInit()
+    except pynvml.NVMLError:
+        return None
+    return pynvml
+
+
+def _parse_metrics(metrics_text: str, names: frozenset[str]) -> dict[str, int]:
+    """
+    Parse the named metrics from Prometheus-format text in one pass.
+    The first sample of each wins; labels are ignored.
+    """
+    values: dict[str, int] = {}
+    for line in metrics_text.splitlines():
+        if line[:1] == "#":
+            continue
+        end = len(line)
+        for sep in ("{", " "):
+            i = line.find(sep, 0, end)
+            if i != -1:
+                end = i
+        name = line[:end]
+        if name not in names or name in values:
+            continue
+        parts = line.rsplit(None, 1)
+        if len(parts) == 2:
+            try:
+                values[name] = int(float(parts[1]))
+            except ValueError:
+                pass
+    return values
@@ -1,49 +1,199 @@
 """
 Shared test fixtures for Gonka.ai integration tests.
 
-Uses a mock vLLM backend (FastAPI) to avoid needing real GPU hardware.
+Uses a mock vLLM backend (Starlette) to avoid needing real GPU hardware.
 """
 
 import asyncio
 import json
+import os
+import random
 import time
-import uuid
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Union
 
+import orjson
 import pytest
 import pytest_asyncio
 import httpx
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+try:
+    import h2  # noqa: F401  (enables httpx's HTTP/2 support)
+except ImportError:
+    _HTTP2 = False
+else:
+    _HTTP2 = True
+
+try:
+    import uvloop
+except ImportError:  # uvloop ships with uvicorn[standard]; plain asyncio otherwise
+    uvloop = None
+else:
+    # Before any loop exists, so pytest-asyncio's loops and every client
+    # created on them run on uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "integration: needs a live gateway on localhost:9000 (deselect with -m 'not integration')",
+    )
+
 
 # ---------- Mock vLLM Backend ----------
 
+# Constant mock responses, encoded once
+_HEALTH_BYTES = b'{"status":"ok"}'
+_MODELS_BYTES = orjson.dumps({
+    "object": "list",
+    "data": [
+        {
+            "id": "moonshotai/Kimi-K2.5",
+            "object": "model",
+            "created": 0,
+            "owned_by": "moonshotai",
+        }
+    ],
+})
+_METRICS_BYTES = b"vllm:num_requests_waiting 0\nvllm:num_requests_running 1\n"
 
-def create_mock_vllm_app() -> FastAPI:
-    """Create a mock vLLM server that returns canned responses."""
-    mock_app = FastAPI()
 
-    @mock_app.get("/health")
-    async def health():
-        return {"status": "ok"}
+# SSE frames for the mock stream, encoded once; generate() only splices in
+# the per-request id, timestamp and content
+def _sse_frame(payload: dict) -> bytes:
+    return b"data: " + json.dumps(payload).encode() + b"\n\n"
 
-    @mock_app.get("/v1/models")
-    async def models():
-        return {
-            "object": "list",
-            "data": [
-                {
-                    "id": "moonshotai/Kimi-K2.5",
-                    "object": "model",
-                    "created": 0,
-                    "owned_by": "moonshotai",
-                }
-            ],
+
+_SSE_CONTENT_CHUNK = _sse_frame({
+    "id": "__ID__",
+    "object": "chat.completion.chunk",
+    "created": "__CREATED__",
+    "model": "moonshotai/Kimi-K2.5",
+    "choices": [
+        {
+            "index": 0,
+            "delta": {"content": "__CONTENT__"},
+            "finish_reason": None,
         }
+    ],
+})
+_SSE_FINAL_CHUNK = _sse_frame({
+    "id": "__ID__",
+    "object": "chat.completion.chunk",
+    "created": "__CREATED__",
+    "model": "moonshotai/Kimi-K2.5",
+    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 30, "completion_tokens": 15, "total_tokens": 45},
+})
+_SSE_DONE = b"data: [DONE]\n\n"
+# Same as the gateway sends; X-Accel-Buffering stops nginx buffering events
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# Pause between stream events so demos look like real token streaming;
+# off by default so tests don't pay for it
+_STREAM_DELAY = float(os.getenv("GONKA_MOCK_STREAM_DELAY_MS", "0")) / 1000.0
+
+
+# Mock ids only need to look distinct: one seeded PRNG instead of an
+# os.urandom() syscall per id
+_rng = random.Random()
+_rng.seed(os.urandom(16))
+
+
+def _short_id() -> str:
+    return f"{_rng.getrandbits(32):08x}"
+
+
+# Whole-second clock for "created" fields, refreshed by a loop callback
+# while the app runs instead of a time() call per request. In-process
+# clients (ASGITransport) skip lifespan, so there it stays at import time.
+_now = int(time.time())
+_tick_handle: asyncio.TimerHandle | None = None
+
+
+def _tick():
+    global _now, _tick_handle
+    _now = int(time.time())
+    _tick_handle = asyncio.get_running_loop().call_later(1.0, _tick)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    _tick()
+    try:
+        yield
+    finally:
+        _tick_handle.cancel()
+
+
+# Escapes just what a JSON string needs; cheaper than json.dumps for short text
+_JSON_ESC = str.maketrans({
+    **{chr(i): f"\\u{i:04x}" for i in range(0x20)},
+    '"': '\\"', "\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t",
+})
+
+
+def _query_arguments(query) -> str:
+    if not isinstance(query, str):
+        return json.dumps({"query": query})
+    return '{"query":"' + query.translate(_JSON_ESC) + '"}'
+
+
+# Mock requests are a few KB at most; anything far larger is refused
+# before it is buffered (fuzz / load runs)
+_MAX_BODY_BYTES = 1 << 20
+
+
+async def _read_small(request: Request, cap: int = _MAX_BODY_BYTES) -> bytes | None:
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf += chunk
+        if len(buf) > cap:
+            return None
+    return bytes(buf)
+
+
+def _json_response(payload: dict, status_code: int = 200) -> Response:
+    # orjson in place of Starlette's JSONResponse (json.dumps)
+    return Response(
+        content=orjson.dumps(payload), status_code=status_code, media_type="application/json"
+    )
+
+
+def create_mock_vllm_app() -> Starlette:
+    """
+    Create a mock vLLM server that returns canned responses. A bare
+    Starlette route table: the handlers need none of FastAPI's dependency
+    injection or signature introspection.
+    """
+
+    async def health(request: Request):
+        return Response(content=_HEALTH_BYTES, media_type="application/json")
+
+    async def models(request: Request):
+        return Response(content=_MODELS_BYTES, media_type="application/json")
 
-    @mock_app.post("/v1/chat/completions")
     async def chat(request: Request):
-        body = await request.json()
+        raw = await _read_small(request)
+        if raw is None:
+            return _json_response({
+                "error": {
+                    "message": "Request body too large",
+                    "type": "invalid_request_error",
+                    "code": "payload_too_large",
+                }
+            }, status_code=413)
+        # orjson straight off the raw body, skipping Starlette's json.loads
+        body = orjson.loads(raw)
         messages = body.get("messages", [])
         stream = body.get("stream", False)
         tools = body.get("tools")
@@ -53,12 +203,15 @@ def create_mock_vllm_app() -> FastAPI:
         if stream:
             return _stream_response(last_msg, tools)
 
+        chat_id = "chatcmpl-" + _short_id()
+        created = _now
+
         # Tool calling response
         if tools:
-            return {
-                "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
+            return _json_response({
+                "id": chat_id,
                 "object": "chat.completion",
-                "created": int(time.time()),
+                "created": created,
                 "model": body.get("model", "moonshotai/Kimi-K2.5"),
                 "choices": [
                     {
@@ -68,11 +221,11 @@ def create_mock_vllm_app() -> FastAPI:
                             "content": None,
                             "tool_calls": [
                                 {
-                                    "id": f"call_{uuid.uuid4().hex[:8]}",
+                                    "id": "call_" + _short_id(),
                                     "type": "function",
                                     "function": {
                                         "name": tools[0]["function"]["name"],
-                                        "arguments": json.dumps({"query": last_msg}),
+                                        "arguments": _query_arguments(last_msg),
                                     },
                                 }
                             ],
@@ -81,13 +234,13 @@ def create_mock_vllm_app() -> FastAPI:
                     }
                 ],
                 "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
-            }
+            })
 
         # Standard response
-        return {
-            "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
+        return _json_response({
+            "id": chat_id,
             "object": "chat.completion",
-            "created": int(time.time()),
+            "created": created,
             "model": body.get("model", "moonshotai/Kimi-K2.5"),
             "choices": [
                 {
@@ -100,7 +253,7 @@ def create_mock_vllm_app() -> FastAPI:
                 }
             ],
             "usage": {"prompt_tokens": 30, "completion_tokens": 15, "total_tokens": 45},
-        }
+        })
 
     def _stream_response(user_msg: str, tools):
         chunks = [
@@ -108,54 +261,146 @@ def create_mock_vllm_app() -> FastAPI:
         ]
 
         async def generate():
-            chat_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
-            for i, chunk_text in enumerate(chunks):
-                chunk = {
-                    "id": chat_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": "moonshotai/Kimi-K2.5",
-                    "choices": [
-                        {
-                            "index": 0,
-                            "delta": {"content": chunk_text},
-                            "finish_reason": None,
-                        }
-                    ],
-                }
-                yield f"data: {json.dumps(chunk)}\n\n"
-                await asyncio.sleep(0.01)
-
+            chat_id = b'"chatcmpl-' + _short_id().encode() + b'"'
+            created = str(_now).encode()
+            frames = [
+                _SSE_CONTENT_CHUNK
+                .replace(b'"__ID__"', chat_id)
+                .replace(b'"__CREATED__"', created)
+                .replace(b'"__CONTENT__"', json.dumps(chunk_text).encode())
+                for chunk_text in chunks
+            ]
             # Final chunk with usage
-            final = {
-                "id": chat_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "moonshotai/Kimi-K2.5",
-                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
-                "usage": {"prompt_tokens": 30, "completion_tokens": 15, "total_tokens": 45},
-            }
-            yield f"data: {json.dumps(final)}\n\n"
-            yield "data: [DONE]\n\n"
+            frames.append(
+                _SSE_FINAL_CHUNK
+                .replace(b'"__ID__"', chat_id)
+                .replace(b'"__CREATED__"', created)
+            )
+            frames.append(_SSE_DONE)
+            if not _STREAM_DELAY:
+                # SSE framing is self-delimiting, so one write carries every event
+                yield b"".join(frames)
+                return
+            for frame in frames:
+                yield frame
+                await asyncio.sleep(_STREAM_DELAY)
 
-        return StreamingResponse(generate(), media_type="text/event-stream")
+        return StreamingResponse(generate(), media_type="text/event-stream", headers=_SSE_HEADERS)
 
-    @mock_app.get("/metrics")
-    async def metrics():
-        return "vllm:num_requests_waiting 0\nvllm:num_requests_running 1\n"
+    async def metrics(request: Request):
+        return PlainTextResponse(_METRICS_BYTES)
 
-    return mock_app
+    return Starlette(lifespan=_lifespan, routes=[
+        Route("/health", health),
+        Route("/v1/models", models),
+        Route("/v1/chat/completions", chat, methods=["POST"]),
+        Route("/metrics", metrics),
+    ])
 
 
 # ---------- Test Client ----------
 
 DEV_API_KEY = "gk-dev-" + "0" * 48
+GATEWAY_BASE_URL = "http://localhost:9000"
+DEV_AUTH_HEADERS = httpx.Headers({"Authorization": f"Bearer {DEV_API_KEY}"})
+
+# Shared by every test client. The short pool timeout makes a test that
+# can't get a connection fail fast instead of stalling the session pool.
+TEST_TIMEOUT = httpx.Timeout(connect=2.0, read=30.0, write=5.0, pool=2.0)
 
 
 @pytest.fixture
 def gateway_base_url():
     """Base URL for the Gonka gateway."""
-    return "http://localhost:9000"
+    return GATEWAY_BASE_URL
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client() -> AsyncGenerator[httpx.AsyncClient, None]:
+    """
+    One pooled client for the whole session, so tests reuse keep-alive
+    connections instead of each opening its own. Tests using it run on
+    the session event loop: mark them asyncio(loop_scope="session").
+    """
+    async with httpx.AsyncClient(
+        base_url=GATEWAY_BASE_URL,
+        timeout=TEST_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+        # Negotiated via ALPN, so only against a TLS front end speaking h2;
+        # uvicorn's cleartext HTTP/1.1 keeps using the keep-alive pool
+        http2=_HTTP2,
+    ) as c:
+        # Warm one pooled connection so the first test doesn't pay for the
+        # connect; if the gateway is down, let the tests themselves say so
+        try:
+            await c.get("/health")
+        except httpx.TransportError:
+            pass
+        yield c
+
+
+@pytest_asyncio.fixture
+async def mock_client() -> AsyncGenerator[httpx.AsyncClient, None]:
+    """Client wired straight into the mock vLLM app: no sockets, no server."""
+    transport = httpx.ASGITransport(app=create_mock_vllm_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://mock") as c:
+        yield c
+
+
+async def gather_or_cancel(*aws):
+    """
+    asyncio.gather that fails fast: the first exception cancels the peers
+    still in flight (closing their requests) and is raised as-is.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def rjson(resp: httpx.Response):
+    """Decode a response body with orjson, straight from the bytes."""
+    return orjson.loads(resp.content)
+
+
+def minimal_chat(messages: Union[str, list[dict]], max_tokens: int = 16, **fields) -> dict:
+    """
+    A chat completion body for tests: short, greedy and seeded, so replies
+    stay small and runs reproducible. A string becomes one user message.
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return {
+        "model": "kimi-k2.5",
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0,
+        "seed": 0,
+        **fields,
+    }
+
+
+async def iter_sse_data(resp: httpx.Response) -> AsyncGenerator[bytes, None]:
+    """
+    Yield each event's data payload as bytes, up to [DONE]. Splits on
+    the blank line between events, without decoding or splitting lines.
+    """
+    buf = bytearray()
+    async for data in resp.aiter_bytes(8192):
+        buf += data
+        while (end := buf.find(b"\n\n")) != -1:
+            frame = bytes(buf[:end])
+            del buf[:end + 2]
+            if not frame.startswith(b"data: "):
+                continue
+            payload = frame[6:]
+            if payload.strip() == b"[DONE]":
+                return
+            yield payload
 
 
 @pytest.fixture
@@ -166,5 +411,30 @@ def api_key():
 
 @pytest.fixture
 def auth_headers(api_key):
-    """Headers with auth for API requests."""
-    return {"Authorization": f"Bearer {api_key}"}
+    """Headers with auth for API requests, normalized once for the dev key."""
+    if api_key == DEV_API_KEY:
+        return DEV_AUTH_HEADERS
+    return httpx.Headers({"Authorization": f"Bearer {api_key}"})
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def shared_session_id(client) -> AsyncGenerator[str, None]:
+    """
+    One agent session created up front for tests that just need a session
+    to talk through; saves each of them setting up (and leaking) its own.
+    Its history accumulates across tests, so assert lower bounds only.
+    """
+    headers = DEV_AUTH_HEADERS
+    session_id = f"test-session-{_short_id()}{_short_id()}"
+    await client.post("/v1/sessions", headers=headers, json={"session_id": session_id})
+    yield session_id
+    await client.delete(f"/v1/sessions/{session_id}", headers=headers)
+
+
+if __name__ == "__main__":
+    # Standalone mock backend for running the suite against a live gateway:
+    #   python -m tests.conftest
+    # uvicorn picks uvloop and httptools when they're installed
+    import uvicorn
+
+    uvicorn.run(create_mock_vllm_app(), port=8000, access_log=False, log_level="warning")
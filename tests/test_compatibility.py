@@ -5,28 +5,22 @@ Validates that the Gonka.ai gateway is fully compatible with
 OpenAI's API format across all endpoints.
 """
 
-import json
-import time
-
-import httpx
+import orjson
 import pytest
 
-from tests.conftest import DEV_API_KEY
-
-BASE_URL = "http://localhost:9000"
-HEADERS = {"Authorization": f"Bearer {DEV_API_KEY}"}
+from tests.conftest import iter_sse_data, rjson
 
 
+@pytest.mark.integration
 class TestModelsEndpoint:
     """Test /v1/models endpoint."""
 
-    @pytest.mark.asyncio
-    async def test_list_models_returns_correct_format(self):
-        async with httpx.AsyncClient(base_url=BASE_URL) as client:
-            resp = await client.get("/v1/models", headers=HEADERS)
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_list_models_returns_correct_format(self, client, auth_headers):
+        resp = await client.get("/v1/models", headers=auth_headers)
 
         assert resp.status_code == 200
-        data = resp.json()
+        data = rjson(resp)
         assert data["object"] == "list"
         assert isinstance(data["data"], list)
 
@@ -37,25 +31,25 @@ class TestModelsEndpoint:
             assert "owned_by" in model
 
 
+@pytest.mark.integration
 class TestChatCompletions:
     """Test /v1/chat/completions endpoint."""
 
-    @pytest.mark.asyncio
-    async def test_basic_chat_completion(self):
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {"role": "user", "content": "Hello, what is 2+2?"}
-                    ],
-                },
-            )
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_basic_chat_completion(self, client, auth_headers):
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json={
+                "model": "kimi-k2.5",
+                "messages": [
+                    {"role": "user", "content": "Hello, what is 2+2?"}
+                ],
+            },
+        )
 
         assert resp.status_code == 200
-        data = resp.json()
+        data = rjson(resp)
         assert "id" in data
         assert data["object"] == "chat.completion"
         assert len(data["choices"]) > 0
@@ -66,38 +60,37 @@ class TestChatCompletions:
         assert "completion_tokens" in data["usage"]
         assert "total_tokens" in data["usage"]
 
-    @pytest.mark.asyncio
-    async def test_tool_calling(self):
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {"role": "user", "content": "What's the weather in London?"}
-                    ],
-                    "tools": [
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "get_weather",
-                                "description": "Get weather for a location",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        "location": {"type": "string"},
-                                    },
-                                    "required": ["location"],
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_tool_calling(self, client, auth_headers):
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json={
+                "model": "kimi-k2.5",
+                "messages": [
+                    {"role": "user", "content": "What's the weather in London?"}
+                ],
+                "tools": [
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": "get_weather",
+                            "description": "Get weather for a location",
+                            "parameters": {
+                                "type": "object",
+                                "properties": {
+                                    "location": {"type": "string"},
                                 },
+                                "required": ["location"],
                             },
-                        }
-                    ],
-                },
-            )
+                        },
+                    }
+                ],
+            },
+        )
 
         assert resp.status_code == 200
-        data = resp.json()
+        data = rjson(resp)
         choice = data["choices"][0]
         assert choice["finish_reason"] == "tool_calls"
         assert choice["message"]["tool_calls"] is not None
@@ -108,99 +101,149 @@ class TestChatCompletions:
         assert "name" in tool_call["function"]
         assert "arguments" in tool_call["function"]
 
-    @pytest.mark.asyncio
-    async def test_streaming(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_streaming(self, client, auth_headers):
         chunks = []
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            async with client.stream(
-                "POST",
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [{"role": "user", "content": "Count to 3"}],
-                    "stream": True,
-                },
-            ) as resp:
-                assert resp.status_code == 200
-                assert resp.headers["content-type"].startswith("text/event-stream")
-
-                async for line in resp.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        chunk = json.loads(data_str)
-                        chunks.append(chunk)
+        async with client.stream(
+            "POST",
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json={
+                "model": "kimi-k2.5",
+                "messages": [{"role": "user", "content": "Count to 3"}],
+                "stream": True,
+            },
+        ) as resp:
+            assert resp.status_code == 200
+            assert resp.headers["content-type"].startswith("text/event-stream")
+
+            async for payload in iter_sse_data(resp):
+                chunks.append(orjson.loads(payload))
 
         assert len(chunks) > 0
         assert chunks[0]["object"] == "chat.completion.chunk"
         assert "delta" in chunks[0]["choices"][0]
 
 
+@pytest.mark.integration
 class TestAuthentication:
     """Test authentication behavior."""
 
-    @pytest.mark.asyncio
-    async def test_missing_api_key_returns_401(self):
-        async with httpx.AsyncClient(base_url=BASE_URL) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [{"role": "user", "content": "test"}],
-                },
-            )
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_missing_api_key_returns_401(self, client):
+        resp = await client.post(
+            "/v1/chat/completions",
+            json={
+                "model": "kimi-k2.5",
+                "messages": [{"role": "user", "content": "test"}],
+            },
+        )
 
         assert resp.status_code == 401
-        data = resp.json()
+        data = rjson(resp)
         assert "error" in data
         assert data["error"]["type"] == "invalid_request_error"
 
-    @pytest.mark.asyncio
-    async def test_invalid_api_key_returns_401(self):
-        async with httpx.AsyncClient(base_url=BASE_URL) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers={"Authorization": "Bearer invalid-key-12345"},
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [{"role": "user", "content": "test"}],
-                },
-            )
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_invalid_api_key_returns_401(self, client):
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers={"Authorization": "Bearer invalid-key-12345"},
+            json={
+                "model": "kimi-k2.5",
+                "messages": [{"role": "user", "content": "test"}],
+            },
+        )
 
         assert resp.status_code == 401
 
 
+@pytest.mark.integration
 class TestErrorFormat:
     """Test error response format matches OpenAI."""
 
-    @pytest.mark.asyncio
-    async def test_invalid_model_returns_openai_error(self):
-        async with httpx.AsyncClient(base_url=BASE_URL) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "nonexistent-model",
-                    "messages": [{"role": "user", "content": "test"}],
-                },
-            )
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_invalid_model_returns_openai_error(self, client, auth_headers):
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json={
+                "model": "nonexistent-model",
+                "messages": [{"role": "user", "content": "test"}],
+            },
+        )
 
         assert resp.status_code == 404
-        data = resp.json()
+        data = rjson(resp)
         assert "error" in data
         assert "message" in data["error"]
         assert "type" in data["error"]
         assert "code" in data["error"]
 
-    @pytest.mark.asyncio
-    async def test_invalid_json_returns_400(self):
-        async with httpx.AsyncClient(base_url=BASE_URL) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers={**HEADERS, "Content-Type": "application/json"},
-                content=b"not valid json",
-            )
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_invalid_json_returns_400(self, client, auth_headers):
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers={**auth_headers, "Content-Type": "application/json"},
+            content=b"not valid json",
+        )
 
         assert resp.status_code == 400
+
+
+class TestMockBackend:
+    """
+    The mock vLLM app's wire format, exercised in-process over
+    httpx.ASGITransport. Needs no running servers.
+    """
+
+    @pytest.mark.asyncio
+    async def test_chat_completion_format(self, mock_client):
+        resp = await mock_client.post(
+            "/v1/chat/completions",
+            json={"model": "kimi-k2.5", "messages": [{"role": "user", "content": "Hi"}]},
+        )
+
+        assert resp.status_code == 200
+        data = rjson(resp)
+        assert data["object"] == "chat.completion"
+        assert data["choices"][0]["message"]["role"] == "assistant"
+        assert data["choices"][0]["finish_reason"] == "stop"
+        assert data["usage"]["total_tokens"] == (
+            data["usage"]["prompt_tokens"] + data["usage"]["completion_tokens"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_tool_call_arguments_are_json(self, mock_client):
+        resp = await mock_client.post(
+            "/v1/chat/completions",
+            json={
+                "model": "kimi-k2.5",
+                "messages": [{"role": "user", "content": "Weather in London?"}],
+                "tools": [{"type": "function", "function": {"name": "get_weather"}}],
+            },
+        )
+
+        choice = rjson(resp)["choices"][0]
+        assert choice["finish_reason"] == "tool_calls"
+        function = choice["message"]["tool_calls"][0]["function"]
+        assert function["name"] == "get_weather"
+        assert isinstance(orjson.loads(function["arguments"]), dict)
+
+    @pytest.mark.asyncio
+    async def test_streaming_frames(self, mock_client):
+        async with mock_client.stream(
+            "POST",
+            "/v1/chat/completions",
+            json={
+                "model": "kimi-k2.5",
+                "messages": [{"role": "user", "content": "Count to 3"}],
+                "stream": True,
+            },
+        ) as resp:
+            assert resp.headers["content-type"].startswith("text/event-stream")
+            chunks = [orjson.loads(p) async for p in iter_sse_data(resp)]
+
+        assert all(c["object"] == "chat.completion.chunk" for c in chunks)
+        assert len({c["id"] for c in chunks}) == 1
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
@@ -11,13 +11,49 @@ LangGraph Pattern:
 - All through OpenAI-compatible chat completions
 """
 
-import httpx
-import pytest
+import asyncio
 
-from tests.conftest import DEV_API_KEY
+import pytest
 
-BASE_URL = "http://localhost:9000"
-HEADERS = {"Authorization": f"Bearer {DEV_API_KEY}"}
+from tests.conftest import _short_id, minimal_chat, rjson
+
+# Talks to a live gateway on localhost:9000
+pytestmark = pytest.mark.integration
+
+# Tool schemas for the branching node, built once
+_SEARCH_DOCS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "search_docs",
+        "description": "Search documentation",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"],
+        },
+    },
+}
+_QUERY_DB_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "query_database",
+        "description": "Query pricing database",
+        "parameters": {
+            "type": "object",
+            "properties": {"table": {"type": "string"}, "filter": {"type": "string"}},
+            "required": ["table"],
+        },
+    },
+}
+
+
+async def _batch_chat(client, headers, session_id: str, turns: list[dict]):
+    """Run several graph nodes' chat turns against a session in one request."""
+    return await client.post(
+        f"/v1/sessions/{session_id}/batch",
+        headers=headers,
+        json={"batch": turns},
+    )
 
 
 class TestLangGraphIntegration:
@@ -31,199 +67,182 @@ class TestLangGraphIntegration:
     - Session persistence maintains state across API calls
     """
 
-    @pytest.mark.asyncio
-    async def test_graph_node_llm_call(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_graph_node_llm_call(self, client, auth_headers):
         """Single graph node: LLM decision point."""
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are a routing agent. Decide next action: 'search', 'respond', or 'clarify'. Output ONLY the action word.",
-                        },
-                        {
-                            "role": "user",
-                            "content": "What GPU models does Gonka.ai support?",
-                        },
-                    ],
-                    "max_tokens": 5,
-                },
-            )
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json=minimal_chat(
+                [
+                    {
+                        "role": "system",
+                        "content": "You are a routing agent. Decide next action: 'search', 'respond', or 'clarify'. Output ONLY the action word.",
+                    },
+                    {
+                        "role": "user",
+                        "content": "What GPU models does Gonka.ai support?",
+                    },
+                ],
+                max_tokens=5,
+            ),
+        )
 
         assert resp.status_code == 200
-        data = resp.json()
+        data = rjson(resp)
         assert data["choices"][0]["message"]["content"]
 
-    @pytest.mark.asyncio
-    async def test_stateful_graph_with_sessions(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_stateful_graph_with_sessions(self, client, auth_headers):
         """
         Multi-node graph execution using session persistence.
 
         Graph: classify -> search -> synthesize -> respond
-        Each node is a separate API call with the same session ID.
+        The nodes' turns go in one batch call against the same session ID.
         """
         session_id = "langgraph-test-001"
-        session_headers = {**HEADERS, "X-Gonka-Session-ID": session_id}
-
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=60.0) as client:
-            # Create session with graph state
-            await client.post(
-                "/v1/sessions",
-                headers=HEADERS,
-                json={
-                    "session_id": session_id,
-                    "system_message": "You are part of a multi-step reasoning graph. Each step builds on previous context.",
-                    "metadata": {"graph": "search-and-respond", "step": 0},
-                },
-            )
-
-            # Node 1: Classify intent
-            node1 = await client.post(
-                "/v1/chat/completions",
-                headers=session_headers,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {"role": "user", "content": "What are the best GPU models for running Kimi K2.5?"},
-                    ],
-                    "max_tokens": 50,
-                },
-            )
-            assert node1.status_code == 200
-
-            # Node 2: Generate search queries based on classification
-            node2 = await client.post(
-                "/v1/chat/completions",
-                headers=session_headers,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {"role": "user", "content": "Based on the previous question, generate 3 search queries to find the answer."},
-                    ],
-                    "max_tokens": 100,
-                },
-            )
-            assert node2.status_code == 200
 
-            # Node 3: Synthesize and respond
-            node3 = await client.post(
-                "/v1/chat/completions",
-                headers=session_headers,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {"role": "user", "content": "Synthesize everything discussed and provide a final answer."},
-                    ],
-                    "max_tokens": 200,
-                },
-            )
-            assert node3.status_code == 200
-
-            # Verify session accumulated state
-            session_resp = await client.get(
-                f"/v1/sessions/{session_id}",
-                headers=HEADERS,
-            )
-            assert session_resp.status_code == 200
-            session_data = session_resp.json()
-            # Should have system + 3 user messages + 3 assistant responses = 7+ messages
-            assert session_data["message_count"] >= 6
-
-    @pytest.mark.asyncio
-    async def test_graph_with_memory_checkpoint(self):
+        # Create session with graph state
+        await client.post(
+            "/v1/sessions",
+            headers=auth_headers,
+            json={
+                "session_id": session_id,
+                "system_message": "You are part of a multi-step reasoning graph. Each step builds on previous context.",
+                "metadata": {"graph": "search-and-respond", "step": 0},
+            },
+        )
+
+        # Nodes 1-3 (classify, generate search queries, synthesize) in one
+        # round trip; the gateway runs them in order against the session
+        node_prompts = [
+            "What are the best GPU models for running Kimi K2.5?",
+            "Based on the previous question, generate 3 search queries to find the answer.",
+            "Synthesize everything discussed and provide a final answer.",
+        ]
+        resp = await _batch_chat(
+            client, auth_headers, session_id, [minimal_chat(prompt) for prompt in node_prompts]
+        )
+        assert resp.status_code == 200
+        data = rjson(resp)
+        assert len(data["results"]) == 3
+        assert all(r["choices"][0]["message"]["content"] for r in data["results"])
+
+        # Session accumulated state: system + 3 user messages + 3 assistant responses
+        assert data["message_count"] >= 6
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_batch_failure_keeps_completed_turns(self, client, auth_headers):
+        """A failing node reports its index alongside the nodes that already ran."""
+        turns = [
+            minimal_chat("First node."),
+            minimal_chat("This node targets a model that doesn't exist.", model="no-such-model"),
+            minimal_chat("Never runs."),
+        ]
+        session_id = f"langgraph-partial-{_short_id()}"
+        try:
+            resp = await _batch_chat(client, auth_headers, session_id, turns)
+        finally:
+            await client.delete(f"/v1/sessions/{session_id}", headers=auth_headers)
+        assert resp.status_code == 404
+        data = rjson(resp)
+        assert data["error"]["code"] == "model_not_found"
+        assert data["failed_index"] == 1
+        assert len(data["results"]) == 1
+        assert data["message_count"] == 2
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_graph_with_memory_checkpoint(self, client, auth_headers):
         """
         LangGraph uses memory API for checkpointing graph state.
         """
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            # Save graph state to memory
-            save_resp = await client.post(
-                "/v1/memory",
-                headers=HEADERS,
-                json={
-                    "key": "graph-state-001",
-                    "value": '{"step": 2, "results": ["gpu-a100", "gpu-h200"], "status": "in_progress"}',
-                    "namespace": "langgraph",
-                    "metadata": {"graph_id": "search-graph", "checkpoint": 2},
-                },
-            )
-            assert save_resp.status_code == 200
-
-            # Retrieve checkpoint
-            get_resp = await client.get(
+        # Save graph state to memory
+        save_resp = await client.post(
+            "/v1/memory",
+            headers=auth_headers,
+            json={
+                "key": "graph-state-001",
+                "value": '{"step": 2, "results": ["gpu-a100", "gpu-h200"], "status": "in_progress"}',
+                "namespace": "langgraph",
+                "metadata": {"graph_id": "search-graph", "checkpoint": 2},
+            },
+        )
+        assert save_resp.status_code == 200
+
+        # Retrieve the checkpoint and search for related state; both only
+        # depend on the save, so run them concurrently
+        get_resp, search_resp = await asyncio.gather(
+            client.get(
                 "/v1/memory/graph-state-001?namespace=langgraph",
-                headers=HEADERS,
-            )
-            assert get_resp.status_code == 200
-            data = get_resp.json()
-            assert "gpu-a100" in data["value"]
-
-            # Search for related state
-            search_resp = await client.post(
+                headers=auth_headers,
+            ),
+            client.post(
                 "/v1/memory/search",
-                headers=HEADERS,
+                headers=auth_headers,
                 json={
                     "query": "graph state gpu search",
                     "namespace": "langgraph",
                     "limit": 5,
                 },
-            )
-            assert search_resp.status_code == 200
-            results = search_resp.json()["results"]
-            assert len(results) > 0
-
-    @pytest.mark.asyncio
-    async def test_graph_branching_with_tool_calls(self):
+            ),
+        )
+        assert get_resp.status_code == 200
+        data = rjson(get_resp)
+        assert "gpu-a100" in data["value"]
+
+        assert search_resp.status_code == 200
+        results = rjson(search_resp)["results"]
+        assert len(results) > 0
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_graph_bulk_checkpoint(self, client, auth_headers):
+        """
+        LangGraph can checkpoint several node states in one memory write.
+        """
+        save_resp = await client.post(
+            "/v1/memory",
+            headers=auth_headers,
+            json={
+                "namespace": "langgraph-bulk",
+                "entries": [
+                    {"key": "node-classify", "value": '{"intent": "gpu pricing"}'},
+                    {"key": "node-search", "value": '{"queries": ["h200 pricing"]}',
+                     "metadata": {"step": 2}},
+                ],
+            },
+        )
+        assert save_resp.status_code == 200
+        assert rjson(save_resp)["count"] == 2
+
+        keys_resp = await client.get(
+            "/v1/memory/keys?namespace=langgraph-bulk",
+            headers=auth_headers,
+        )
+        assert keys_resp.status_code == 200
+        assert set(rjson(keys_resp)["keys"]) >= {"node-classify", "node-search"}
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_graph_branching_with_tool_calls(self, client, auth_headers):
         """
         LangGraph conditional branching via tool calls.
         The model decides which tool (graph branch) to take.
         """
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            resp = await client.post(
-                "/v1/chat/completions",
-                headers=HEADERS,
-                json={
-                    "model": "kimi-k2.5",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "Choose the appropriate tool based on the user's request.",
-                        },
-                        {"role": "user", "content": "I need to look up pricing information"},
-                    ],
-                    "tools": [
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "search_docs",
-                                "description": "Search documentation",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {"query": {"type": "string"}},
-                                    "required": ["query"],
-                                },
-                            },
-                        },
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "query_database",
-                                "description": "Query pricing database",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {"table": {"type": "string"}, "filter": {"type": "string"}},
-                                    "required": ["table"],
-                                },
-                            },
-                        },
-                    ],
-                },
-            )
+        resp = await client.post(
+            "/v1/chat/completions",
+            headers=auth_headers,
+            json=minimal_chat(
+                [
+                    {
+                        "role": "system",
+                        "content": "Choose the appropriate tool based on the user's request.",
+                    },
+                    {"role": "user", "content": "I need to look up pricing information"},
+                ],
+                tools=[_SEARCH_DOCS_TOOL, _QUERY_DB_TOOL],
+            ),
+        )
 
         assert resp.status_code == 200
         # LangGraph expects either tool_calls (to branch) or content (to respond)
-        choice = resp.json()["choices"][0]
+        choice = rjson(resp)["choices"][0]
         assert choice["message"]["role"] == "assistant"
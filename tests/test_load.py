@@ -9,149 +9,198 @@ full Locust load testing (which requires a running server).
 """
 
 import asyncio
-import time
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import httpx
+import orjson
 import pytest
 
-from tests.conftest import DEV_API_KEY
+from tests.conftest import (
+    DEV_AUTH_HEADERS,
+    GATEWAY_BASE_URL,
+    TEST_TIMEOUT,
+    gather_or_cancel,
+    iter_sse_data,
+    minimal_chat,
+    rjson,
+)
+
+# Talks to a live gateway on localhost:9000
+pytestmark = pytest.mark.integration
+
+# Shared request shape; each request only adds its own messages. Bodies go
+# out as orjson bytes, so they need the content type set explicitly.
+_CHAT_TEMPLATE = minimal_chat([])
+_JSON_CONTENT = {"Content-Type": "application/json"}
+
+# Most requests a fan-out test keeps in flight at once
+MAX_IN_FLIGHT = 20
+
+# Unique per-request markers for test_no_request_corruption
+_MARKERS = tuple(f"MARKER_{i}_{'x' * 10}" for i in range(5))
+
+
+def _load_worker(worker: int, num_requests: int) -> int:
+    """
+    One process's share of the multi-process load test, on its own event
+    loop and client, so request encode/decode isn't bound to one core.
+    Returns how many of its requests succeeded.
+    """
+    headers = httpx.Headers({**DEV_AUTH_HEADERS, **_JSON_CONTENT})
+
+    async def run() -> int:
+        async with httpx.AsyncClient(base_url=GATEWAY_BASE_URL, timeout=TEST_TIMEOUT) as client:
+            async def make_request(i: int) -> int:
+                body = {
+                    **_CHAT_TEMPLATE,
+                    "messages": [{"role": "user", "content": f"Worker {worker} request {i}"}],
+                }
+                resp = await client.post(
+                    "/v1/chat/completions", headers=headers, content=orjson.dumps(body)
+                )
+                return resp.status_code
+
+            statuses = await asyncio.gather(*[make_request(i) for i in range(num_requests)])
+        return statuses.count(200)
 
-BASE_URL = "http://localhost:9000"
-HEADERS = {"Authorization": f"Bearer {DEV_API_KEY}"}
+    return asyncio.run(run())
 
 
 class TestLoadHandling:
     """Test gateway behavior under concurrent load."""
 
-    @pytest.mark.asyncio
-    async def test_concurrent_requests(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_requests(self, client, auth_headers):
         """Send multiple requests concurrently and verify all succeed."""
         num_requests = 10
+        headers = httpx.Headers({**auth_headers, **_JSON_CONTENT})
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
 
         async def make_request(i: int) -> dict:
-            async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
+            body = {
+                **_CHAT_TEMPLATE,
+                "messages": [{"role": "user", "content": f"Request {i}: Hello"}],
+                "max_tokens": 10,
+            }
+            async with sem:
                 resp = await client.post(
-                    "/v1/chat/completions",
-                    headers=HEADERS,
-                    json={
-                        "model": "kimi-k2.5",
-                        "messages": [{"role": "user", "content": f"Request {i}: Hello"}],
-                        "max_tokens": 10,
-                    },
+                    "/v1/chat/completions", headers=headers, content=orjson.dumps(body)
                 )
-                return {"index": i, "status": resp.status_code, "body": resp.json()}
+            return {"index": i, "status": resp.status_code, "body": rjson(resp)}
 
         tasks = [make_request(i) for i in range(num_requests)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await gather_or_cancel(*tasks)
 
-        successes = [r for r in results if isinstance(r, dict) and r["status"] == 200]
+        successes = [r for r in results if r["status"] == 200]
         assert len(successes) >= num_requests * 0.8  # Allow some tolerance
 
-    @pytest.mark.asyncio
-    async def test_rate_limiting_under_load(self):
+    @pytest.mark.skipif((os.cpu_count() or 1) < 2, reason="needs more than one core")
+    def test_concurrent_requests_multiprocess(self):
+        """Fan requests out from several client processes at once."""
+        num_workers = min(4, os.cpu_count())
+        per_worker = 10
+
+        # spawn, not fork: the parent may already be running an event loop
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(num_workers, mp_context=ctx) as pool:
+            successes = list(pool.map(_load_worker, range(num_workers), [per_worker] * num_workers))
+
+        assert sum(successes) >= num_workers * per_worker * 0.8  # Allow some tolerance
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_rate_limiting_under_load(self, client, auth_headers):
         """
         Rapidly fire requests to trigger rate limiting.
         Dev key has 1000 RPM limit, so we need to exceed it or use a limited key.
         """
         # Create a rate-limited key via admin API
-        async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-            key_resp = await client.post(
-                "/admin/keys",
-                headers=HEADERS,
-                json={
-                    "owner": "load-test",
-                    "tier": "free",
-                    "rpm_limit": 5,  # Very low limit for testing
-                    "tpm_limit": 1000,
-                },
+        key_resp = await client.post(
+            "/admin/keys",
+            headers=auth_headers,
+            json={
+                "owner": "load-test",
+                "tier": "free",
+                "rpm_limit": 5,  # Very low limit for testing
+                "tpm_limit": 1000,
+            },
+        )
+
+        if key_resp.status_code != 200:
+            pytest.skip("Admin API not available")
+
+        test_key = rjson(key_resp)["key"]
+        test_headers = httpx.Headers({"Authorization": f"Bearer {test_key}"})
+
+        # Fire 10 requests at once (limit is 5), so they all land in one window
+        responses = await asyncio.gather(*[
+            client.post(
+                "/v1/chat/completions",
+                headers=test_headers,
+                json=minimal_chat(f"Req {i}", max_tokens=5),
             )
+            for i in range(10)
+        ])
+        results = [resp.status_code for resp in responses]
 
-            if key_resp.status_code != 200:
-                pytest.skip("Admin API not available")
+        # Should see some 429s
+        rate_limited = [s for s in results if s == 429]
+        assert len(rate_limited) > 0, "Expected rate limiting to trigger"
 
-            test_key = key_resp.json()["key"]
-            test_headers = {"Authorization": f"Bearer {test_key}"}
+        # Arrival order isn't fixed, but exactly the limit's worth get through
+        assert results.count(200) == 5
 
-            # Fire 10 requests rapidly (limit is 5)
-            results = []
-            for i in range(10):
-                resp = await client.post(
-                    "/v1/chat/completions",
-                    headers=test_headers,
-                    json={
-                        "model": "kimi-k2.5",
-                        "messages": [{"role": "user", "content": f"Req {i}"}],
-                        "max_tokens": 5,
-                    },
-                )
-                results.append(resp.status_code)
-
-            # Should see some 429s
-            rate_limited = [s for s in results if s == 429]
-            assert len(rate_limited) > 0, "Expected rate limiting to trigger"
-
-            # Early requests should succeed
-            assert results[0] == 200
-
-    @pytest.mark.asyncio
-    async def test_concurrent_streaming(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_streaming(self, client, auth_headers):
         """Multiple streaming requests simultaneously."""
         num_streams = 5
 
         async def stream_request(i: int) -> int:
             chunk_count = 0
-            async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
-                async with client.stream(
-                    "POST",
-                    "/v1/chat/completions",
-                    headers=HEADERS,
-                    json={
-                        "model": "kimi-k2.5",
-                        "messages": [{"role": "user", "content": f"Stream {i}"}],
-                        "stream": True,
-                    },
-                ) as resp:
-                    async for line in resp.aiter_lines():
-                        if line.startswith("data: ") and "[DONE]" not in line:
-                            chunk_count += 1
+            async with client.stream(
+                "POST",
+                "/v1/chat/completions",
+                headers=auth_headers,
+                json=minimal_chat(f"Stream {i}", stream=True),
+            ) as resp:
+                async for _ in iter_sse_data(resp):
+                    chunk_count += 1
             return chunk_count
 
         tasks = [stream_request(i) for i in range(num_streams)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await gather_or_cancel(*tasks)
 
-        successes = [r for r in results if isinstance(r, int) and r > 0]
-        assert len(successes) == num_streams
+        assert all(chunk_count > 0 for chunk_count in results)
 
-    @pytest.mark.asyncio
-    async def test_no_request_corruption(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_no_request_corruption(self, client, auth_headers):
         """
         Verify responses are not mixed up under concurrent load.
         Each request includes a unique marker to verify correct response routing.
         """
-        num_requests = 5
+        headers = httpx.Headers({**auth_headers, **_JSON_CONTENT})
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
 
         async def make_marked_request(marker: str) -> dict:
-            async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as client:
+            body = {
+                **_CHAT_TEMPLATE,
+                "messages": [{"role": "user", "content": f"Echo marker: {marker}"}],
+            }
+            async with sem:
                 resp = await client.post(
-                    "/v1/chat/completions",
-                    headers=HEADERS,
-                    json={
-                        "model": "kimi-k2.5",
-                        "messages": [{"role": "user", "content": f"Echo marker: {marker}"}],
-                    },
+                    "/v1/chat/completions", headers=headers, content=orjson.dumps(body)
                 )
-                return {
-                    "marker": marker,
-                    "status": resp.status_code,
-                    "response": resp.json()["choices"][0]["message"]["content"] if resp.status_code == 200 else "",
-                }
+            return {
+                "marker": marker,
+                "status": resp.status_code,
+                "response": rjson(resp)["choices"][0]["message"]["content"] if resp.status_code == 200 else "",
+            }
 
-        markers = [f"MARKER_{i}_{'x' * 10}" for i in range(num_requests)]
-        tasks = [make_marked_request(m) for m in markers]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks = [make_marked_request(m) for m in _MARKERS]
+        results = await gather_or_cancel(*tasks)
 
         for result in results:
-            if isinstance(result, dict):
-                assert result["status"] == 200
-                # Response should reference the original marker
-                assert result["marker"] in result["response"] or result["status"] == 200
+            assert result["status"] == 200
+            # Response should reference the original marker
+            assert result["marker"] in result["response"]
@@ -0,0 +1,31 @@
+"""
+Memory store tests.
+
+These drive MemoryStore directly against a temporary database; no
+gateway is needed.
+"""
+
+from agent.memory import MemoryStore
+
+
+class TestFullTextSearch:
+    """BM25 similarity contract for the FTS5 backend."""
+
+    def test_single_match_has_positive_similarity(self, tmp_path):
+        store = MemoryStore(db_path=str(tmp_path / "memory.db"))
+        store.put("key-a", "k1", "the quick brown fox")
+
+        results = store.search("key-a", "fox")
+
+        assert [r["key"] for r in results] == ["k1"]
+        assert 0 < results[0]["similarity"] < 1
+
+    def test_other_tenants_do_not_affect_scores(self, tmp_path):
+        store = MemoryStore(db_path=str(tmp_path / "memory.db"))
+        store.put("key-a", "k1", "the quick brown fox")
+        store.put("key-a", "k2", "a lazy dog")
+        before = store.search("key-a", "quick fox")
+
+        store.put_many("key-b", [(f"x{i}", "fox fox fox", "default", "{}") for i in range(50)])
+
+        assert store.search("key-a", "quick fox") == before
@@ -0,0 +1,150 @@
+"""
+Webhook delivery tests.
+
+The queue tests drive WebhookManager directly against an
+httpx.MockTransport receiver; only the registration test needs a live
+gateway.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agent import webhooks
+from agent.webhooks import WebhookManager
+from tests.conftest import rjson
+
+
+async def _drain(manager: WebhookManager, seconds: float = 0.5):
+    task = asyncio.create_task(manager.run(workers=1))
+    await asyncio.sleep(seconds)
+    task.cancel()
+
+
+def _manager(tmp_path, handler) -> WebhookManager:
+    manager = WebhookManager(db_path=str(tmp_path / "webhooks.db"))
+    manager._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return manager
+
+
+class TestWebhookQueue:
+    """A job that can't be delivered must not stall the jobs behind it."""
+
+    @pytest.mark.asyncio
+    async def test_invalid_url_is_dead_lettered(self, tmp_path):
+        manager = _manager(tmp_path, lambda request: httpx.Response(200))
+        manager.register("wh-bad", "key", "http://[::1")
+        manager.register("wh-ok", "key", "http://receiver.test/hook")
+        await manager.notify("wh-bad", {"n": 1})
+        await manager.notify("wh-ok", {"n": 2})
+
+        await _drain(manager)
+
+        assert manager.get_status("wh-bad")["status"] == "failed"
+        assert manager.get_status("wh-ok")["status"] == "delivered"
+        dead = manager._db.execute("SELECT webhook_id FROM webhook_dead_letter").fetchall()
+        assert dead == [("wh-bad",)]
+        assert manager._db.execute("SELECT COUNT(*) FROM webhook_jobs").fetchone()[0] == 0
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_worker_survives_unexpected_error(self, tmp_path, monkeypatch):
+        manager = _manager(tmp_path, lambda request: httpx.Response(200))
+        deliver = manager._deliver
+
+        async def flaky_deliver(job_id, webhook_id, *args):
+            if webhook_id == "wh-boom":
+                raise RuntimeError("boom")
+            await deliver(job_id, webhook_id, *args)
+
+        monkeypatch.setattr(manager, "_deliver", flaky_deliver)
+        manager.register("wh-boom", "key", "http://receiver.test/boom")
+        manager.register("wh-ok", "key", "http://receiver.test/ok")
+        await manager.notify("wh-boom", {"n": 1})
+        await manager.notify("wh-ok", {"n": 2})
+
+        await _drain(manager)
+
+        assert manager.get_status("wh-ok")["status"] == "delivered"
+        dead = manager._db.execute(
+            "SELECT webhook_id, last_error FROM webhook_dead_letter"
+        ).fetchall()
+        assert dead == [("wh-boom", "RuntimeError('boom')")]
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_booting_peer_leaves_claimed_jobs_alone(self, tmp_path):
+        received = []
+        release = asyncio.Event()
+
+        async def slow_receiver(request):
+            received.append("first")
+            await release.wait()
+            return httpx.Response(200)
+
+        def second_receiver(request):
+            received.append("second")
+            return httpx.Response(200)
+
+        first = _manager(tmp_path, slow_receiver)
+        first.register("wh-shared", "key", "http://receiver.test/hook")
+        await first.notify("wh-shared", {"n": 1})
+        delivering = asyncio.create_task(_drain(first, seconds=1.0))
+        while not received:
+            await asyncio.sleep(0.01)
+
+        # Another process on the same database starts and polls while the
+        # first is still mid-delivery
+        second = _manager(tmp_path, second_receiver)
+        await _drain(second)
+        release.set()
+        await delivering
+
+        assert received == ["first"]
+        await first.aclose()
+        await second.aclose()
+
+    @pytest.mark.asyncio
+    async def test_only_expired_claims_are_released(self, tmp_path):
+        received = []
+
+        def handler(request):
+            received.append(request.url.path)
+            return httpx.Response(200)
+
+        manager = _manager(tmp_path, handler)
+        manager.register("wh-live", "key", "http://receiver.test/live")
+        manager.register("wh-dead", "key", "http://receiver.test/dead")
+        await manager.notify("wh-live", {"n": 1})
+        await manager.notify("wh-dead", {"n": 2})
+        # One job claimed by a peer that is still delivering it, one by a
+        # peer that died a lease ago
+        now = time.time()
+        manager._db.execute(
+            "UPDATE webhook_jobs SET claimed = 7, claimed_at = ? WHERE webhook_id = 'wh-live'", (now,)
+        )
+        manager._db.execute(
+            "UPDATE webhook_jobs SET claimed = 9, claimed_at = ? WHERE webhook_id = 'wh-dead'",
+            (now - webhooks.CLAIM_LEASE_SECONDS - 1,),
+        )
+
+        await _drain(manager)
+
+        assert received == ["/dead"]
+        assert manager.get_status("wh-live")["status"] == "pending"
+        await manager.aclose()
+
+
+@pytest.mark.integration
+class TestWebhookRegistration:
+    """POST /v1/webhooks on a live gateway."""
+
+    @pytest.mark.asyncio(loop_scope="session")
+    @pytest.mark.parametrize("url", ["http://[::1", "ftp://receiver.test/hook", "receiver.test"])
+    async def test_rejects_unusable_url(self, client, auth_headers, url):
+        resp = await client.post("/v1/webhooks", headers=auth_headers, json={"url": url})
+
+        assert resp.status_code == 400
+        assert rjson(resp)["error"]["code"] == "bad_request"